@@ -1,22 +1,289 @@
 # -*- coding: utf-8 -*-
+import uuid
 import streamlit as st
 import pandas as pd
-from src.loader import load_data
+from src.loader import load_data, memory_summary
 from src.analysis import get_column_types, identify_key_metrics
-from src.visualizer import generate_dashboard_charts, format_number
-from src.copilot import ask_copilot 
-from src.demo_data import load_demo_data # Added import
+from src.visualizer import dashboard_chart_specs, build_dashboard_chart, chart_plan, selection_filter, dashboard_columns, format_number, scatter_figure, box_figure, sorted_series, get_sorted_series, trend_figure, FULL_CHART_WIDTH_PX, HALF_CHART_WIDTH_PX
+from src.copilot import ask_copilot_stream, get_response_cache
+from src.results import get_result_store, RESULT_PAGE_ROWS
+from src.chat_history import ChatHistory
+from src.demo_data import load_demo_data, demo_data_key, DEMO_FILE_NAME # Added import
+from src.cache import cache_key
+from src.store import get_dataset_store
+from src.profiler import get_column_profile
+from src.scan import get_scan_registry, run_scan
+from src.figure_cache import get_figure_cache
+from src.aggregation import AggregationPlan
+from src.filters import get_filter_index, FilteredView
+from src.cube import get_data_cube
 from dotenv import load_dotenv
 
 load_dotenv()
 import plotly.express as px
 import plotly.graph_objects as go
-import numpy as np
 import streamlit.components.v1 as components
 
+# --- HELPER: SHARED DATASETS ---
+# Sessions hold a DatasetHandle into the process-wide store, never their own DataFrame copy.
+# The shared frame is read-only: derive new frames instead of assigning columns in place.
+def get_active_df():
+    handle = st.session_state.get('dataset')
+    return handle.df if handle is not None else None
+
+def get_active_profile():
+    """Column statistics of the active dataset, shared by every session on the same data."""
+    handle = st.session_state.get('dataset')
+    return get_column_profile(handle.key, handle.df) if handle is not None else None
+
+def activate_dataset(handle):
+    """Points this session at a shared dataset and resets per-dataset UI state."""
+    previous = st.session_state.get('dataset')
+    st.session_state.dataset = handle
+    if previous is not None and previous is not handle:
+        previous.release()
+    st.session_state.col_types = get_column_types(handle.df)
+    st.session_state.uploaded_file_name = handle.name
+    st.session_state.dashboard_generated = False
+    st.session_state.cross_filters = {}
+
+def load_demo_dataset():
+    """Returns a handle to the shared demo dataset, loading it only if no session has yet."""
+    store = get_dataset_store()
+    key = demo_data_key()
+    handle = store.acquire(key, DEMO_FILE_NAME) if key else None
+    if handle is None:
+        df = load_demo_data()
+        if df is None:
+            return None
+        handle = store.put(key or DEMO_FILE_NAME, df, DEMO_FILE_NAME)
+    return handle
+
+# --- HELPER: ZOOMABLE TREND ---
+def zoom_window(x, key):
+    """
+    Range slider over a sorted series' x values. Plotly zoom events don't reach the server,
+    so this is how a focused trend asks for a narrower window at full resolution.
+    """
+    if len(x) < 2 or x[0] == x[-1]:
+        return None
+    lo, hi = x[0], x[-1]
+    if x.dtype.kind == 'M':
+        lo, hi = pd.Timestamp(lo).to_pydatetime(), pd.Timestamp(hi).to_pydatetime()
+    else:
+        lo, hi = float(lo), float(hi)
+    return st.slider("Zoom window", min_value=lo, max_value=hi, value=(lo, hi), key=key)
+
+# --- HELPER: DASHBOARD ---
+# Categoricals with fewer values than this can be sidebar filters and data cube dimensions
+LOW_CARDINALITY = 50
+
+def dashboard_filter_columns(col_types, profile):
+    """The (up to 3) lowest-cardinality categoricals offered as sidebar filters."""
+    filter_cols = [c for c in col_types['categorical'] if profile.nunique(c) < LOW_CARDINALITY]
+    filter_cols.sort(key=profile.nunique)
+    return tuple(filter_cols[:3])
+
+def dashboard_layout(col_types, profile):
+    """
+    What the Dashboard shows for the active dataset: KPI columns, chart specs, sidebar
+    filter columns and the FilterIndex over them and the charts' cross-filter columns.
+    Derived from the ColumnProfile, so it does not change with filters.
+    """
+    df = get_active_df()
+    kpi_cols = identify_key_metrics(df, col_types, profile)
+    specs = dashboard_chart_specs(col_types, kpi_cols, profile.nunique)
+    date_col = col_types['date'][0] if col_types['date'] else None
+    filter_cols = dashboard_filter_columns(col_types, profile)
+    cross_cols = tuple(spec["dim"] for spec in specs if spec["dim"] is not None and spec["kind"] != "trend")
+    return {
+        "kpi_cols": kpi_cols,
+        "specs": specs,
+        "date_col": date_col,
+        "filter_cols": filter_cols,
+        "cross_cols": cross_cols,
+        "index": get_filter_index(st.session_state.dataset.key, df, date_col, filter_cols, cross_cols),
+    }
+
+def dashboard_rows(layout, filters):
+    """FilteredView of the active dataset for a filter tuple."""
+    mask = layout["index"].select(filters)
+    return FilteredView(get_active_df(), None if mask is None else layout["index"].positions(mask))
+
+def build_dashboard(layout, col_types, profile, sidebar_filters=(), cross_filters=None):
+    """
+    KPI totals and charts for the current filters.
+    Each chart is cached under the filters that apply to it: the sidebar filters plus every
+    cross-filter except the one set from that chart. Selecting on one chart therefore
+    rebuilds only the others. Charts that share a filter set share their sums and counts:
+    from the dataset's DataCube when it covers them, otherwise from one AggregationPlan
+    over the selected rows.
+    """
+    figure_cache = get_figure_cache()
+    key = st.session_state.dataset.key
+    kpi_cols, specs = layout["kpi_cols"], layout["specs"]
+    metric = kpi_cols[0] if kpi_cols else None
+    cross_filters = cross_filters or {}
+    cube_dims = layout["filter_cols"] + tuple(d for d in layout["cross_cols"] if profile.nunique(d) < LOW_CARDINALITY)
+    cube = get_data_cube(key, get_active_df(), layout["date_col"], tuple(dict.fromkeys(cube_dims)), tuple(kpi_cols))
+    # Only the columns the charts read are taken from the selected rows, once per filter set
+    columns = dashboard_columns(col_types, kpi_cols, profile.nunique)
+    frames = {}
+
+    def rows(filters):
+        if filters not in frames:
+            frames[filters] = dashboard_rows(layout, filters).frame(columns)
+        return frames[filters]
+
+    def selection(filters):
+        return cube.select(filters, metric) if cube is not None else None
+
+    def build_totals(filters):
+        cells = selection(filters)
+        if cells is not None:
+            return {col: cells.total(col) for col in kpi_cols[:4]}
+        df = rows(filters)
+        return {col: df[col].sum() for col in kpi_cols[:4]}
+
+    all_filters = sidebar_filters + tuple(f for _, f in sorted(cross_filters.items()))
+    kpi_totals = figure_cache.get_or_build((key, all_filters, "kpis", tuple(kpi_cols)), lambda: build_totals(all_filters))
+
+    # Look every chart up first; the missing ones are built per filter set, with one batched
+    # AggregationPlan (or cube selection) for all grouped charts that share that set
+    charts, missing = [], {}
+    for i, spec in enumerate(specs):
+        filters = sidebar_filters + tuple(f for dim, f in sorted(cross_filters.items()) if dim != spec["dim"])
+        cache_key = (key, filters, spec["kind"], spec["dim"], tuple(kpi_cols))
+        chart = figure_cache.get(cache_key)
+        if chart is None:
+            missing.setdefault(filters, []).append((i, spec, cache_key))
+        charts.append(chart and {**chart, "filters": filters})
+    for filters, entries in missing.items():
+        grouped = [spec for _, spec, _ in entries if spec["kind"] in ("trend", "pie", "ranking", "secondary")]
+        plan = chart_plan(lambda: rows(filters), grouped, kpi_cols, selection(filters)) if grouped else None
+        for i, spec, cache_key in entries:
+            df = rows(filters) if spec["kind"] in ("scatter", "histogram") else None
+            chart = build_dashboard_chart(spec, df, kpi_cols, plan)
+            figure_cache.put(cache_key, chart)
+            charts[i] = {**chart, "filters": filters}
+    return {"kpi_cols": kpi_cols, "kpi_totals": kpi_totals, "charts": charts}
+
+def apply_chart_selection(chart_key, chart):
+    """on_select callback: records a dashboard chart's selection as a cross-filter on its column."""
+    state = st.session_state.get(chart_key) or {}
+    entry = selection_filter(chart, state.get("selection"))
+    cross_filters = dict(st.session_state.cross_filters)
+    if entry is None:
+        cross_filters.pop(chart["dim"], None)
+    else:
+        cross_filters[chart["dim"]] = entry
+    st.session_state.cross_filters = cross_filters
+
+# --- HELPER: COPILOT CHAT ---
+def chat_message_html(msg):
+    """HTML bubble for one Copilot chat message."""
+    content = msg["content"]
+    display_html = ""
+    
+    # Handle structured response (dict) vs legacy string
+    if isinstance(content, dict):
+        main_text = content.get("content", "")
+        code_text = content.get("code", "")
+        main_text = main_text.replace("\n", "<br>") 
+        result = content.get("result")
+        if result:
+            # Only the bounded preview lives in the history; the full table is in the result store
+            rows, cols = result["shape"]
+            preview_html = result["preview"].to_html(classes="copilot-result-table", border=0, index=False)
+            more = f"First {len(result['preview'])} of {rows:,} rows" if rows > len(result["preview"]) else f"{rows:,} rows"
+            if cols > result["preview"].shape[1]:
+                more += f", first {result['preview'].shape[1]} of {cols:,} columns"
+            main_text += f'<div style="overflow-x: auto;">{preview_html}</div><div style="font-size: 0.7rem; color: #94a3b8; margin-top: 4px;">{more} · {"full table under Full results" if result["result_id"] else "too large to keep in full"}</div>'
+        if content.get("cached"):
+            main_text += '<div style="font-size: 0.7rem; color: #94a3b8; margin-top: 4px;">⚡ Answered from cache</div>'
+        
+        if content.get("type") == "code" and code_text:
+            # Styled Code Block using HTML <details>
+            code_html = f"""
+            <div style="margin-top: 8px;">
+                <details style="border: 1px solid #e2e8f0; border-radius: 8px; overflow: hidden; background-color: white;">
+                    <summary style="padding: 6px 12px; cursor: pointer; background-color: #f8fafc; font-size: 0.8rem; color: #64748b; font-weight: 500; outline: none; user-select: none;">
+                        \U00002728 Thinking Process
+                    </summary>
+                    <div style="background-color: #0f172a; color: #f8fafc; padding: 12px; font-family: 'Consolas', 'Monaco', monospace; font-size: 0.8rem; overflow-x: auto; border-top: 1px solid #e2e8f0;">
+                        <pre style="margin: 0; white-space: pre-wrap;">{code_text}</pre>
+                    </div>
+                </details>
+            </div>
+            """
+            display_html = f"<div>{main_text}</div>{code_html}"
+        else:
+            display_html = main_text
+    else:
+        # Legacy string
+        display_html = str(content).replace("\n", "<br>")
+
+    if msg["role"] == "user":
+        return f'<div class="chat-bubble" style="background-color: #e0f2fe; color: #0369a1; align-self: flex-end; margin-left: auto; width: fit-content; max-width: 80%; text-align: right;">{display_html}</div>'
+    return f'<div class="chat-bubble" style="background-color: #f1f5f9; color: #334155; align-self: flex-start; max-width: 90%;">{display_html}</div>'
+
+def cached_message_html(msg):
+    """chat_message_html, rendered once per message and kept on it."""
+    if "html" not in msg:
+        msg["html"] = chat_message_html(msg)
+    return msg["html"]
+
+# Height of the scrolling message list inside the Chat Assistant card
+CHAT_HEIGHT_PX = 440
+
+CHAT_CARD_HEADER = """
+    <div class="card-header-row">
+        <div class="header-icon-box bg-purple">\U0001F916</div>
+        <div class="card-title-text">Chat Assistant</div>
+    </div>
+"""
+
+def render_result_explorer(history):
+    """Paged view and CSV/Parquet downloads of the full tables behind the chat's result previews."""
+    results = []
+    question = None
+    for msg in history:
+        if msg["role"] == "user":
+            question = msg["content"]
+        elif isinstance(msg["content"], dict) and msg["content"].get("result"):
+            results.append((question, msg["content"]["result"]))
+    if not results:
+        return
+
+    with st.expander(f"📋 Full results ({len(results)})"):
+        labels = [f"{q} ({r['shape'][0]:,} rows)" for q, r in results]
+        choice = st.selectbox("Result", range(len(results)), index=len(results) - 1,
+                              format_func=lambda i: labels[i], key=f"copilot_result_choice_{len(results)}")  # a new result is selected when it arrives
+        result_id = results[choice][1]["result_id"]
+        if result_id is None:
+            st.caption("This result was too large to keep; only its preview is shown in the chat.")
+            return
+        store = get_result_store()
+        pages = max(1, -(-results[choice][1]["shape"][0] // RESULT_PAGE_ROWS))
+        page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1,
+                               key=f"copilot_result_page_{result_id}")
+        # Only the requested page is read from the store and sent to the browser
+        rows = store.page(result_id, page - 1)
+        if rows is None:
+            st.caption("This result is no longer stored. Ask the question again to recompute it.")
+            return
+        st.dataframe(rows, hide_index=True, width="stretch")
+        d1, d2 = st.columns(2)
+        with d1:
+            st.download_button("Download CSV", data=lambda: store.to_csv(result_id), file_name="copilot_result.csv",
+                               mime="text/csv", key=f"copilot_csv_{result_id}", width="stretch")
+        with d2:
+            st.download_button("Download Parquet", data=lambda: store.to_parquet(result_id), file_name="copilot_result.parquet",
+                               mime="application/octet-stream", key=f"copilot_parquet_{result_id}", width="stretch")
+
 # --- HELPER: CHECK DATA LOADED ---
 def check_data_loaded():
-    if st.session_state.df is None:
+    if get_active_df() is None:
         st.markdown("""
         <div style="background: linear-gradient(135deg, rgba(30, 41, 59, 0.8) 0%, rgba(15, 23, 42, 0.9) 100%); border: 1px solid rgba(99, 102, 241, 0.3); border-radius: 16px; padding: 2.5rem; text-align: center; margin-top: 2rem; margin-bottom: 2rem; box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);">
             <div style="background: linear-gradient(135deg, rgba(99, 102, 241, 0.2) 0%, rgba(139, 92, 246, 0.2) 100%); width: 60px; height: 60px; border-radius: 50%; display: inline-flex; align-items: center; justify-content: center; margin-bottom: 1rem; border: 1px solid rgba(99, 102, 241, 0.3);">
@@ -38,12 +305,9 @@ def check_data_loaded():
              with col_demo:
                  if st.button("🚀 Launch Weather Demo", type="primary", width="stretch"):
                      with st.spinner("Loading demo data..."):
-                         df = load_demo_data()
-                         if df is not None:
-                             st.session_state.df = df
-                             st.session_state.col_types = get_column_types(df)
-                             st.session_state.uploaded_file_name = "Global_Weather_Demo.xlsx"
-                             st.session_state.dashboard_generated = False
+                         handle = load_demo_dataset()
+                         if handle is not None:
+                             activate_dataset(handle)
                              st.rerun()
              with col_upload:
                  if st.button("📂 Go to Data Source", width="stretch"):
@@ -69,14 +333,16 @@ if "nav" in st.query_params:
 # --- SESSION STATE INITIALIZATION ---
 if 'page' not in st.session_state:
     st.session_state.page = "Home"
-if 'df' not in st.session_state:
-    st.session_state.df = None
+if 'dataset' not in st.session_state:
+    st.session_state.dataset = None
 if 'col_types' not in st.session_state:
     st.session_state.col_types = None
 if 'focused_chart_index' not in st.session_state:
     st.session_state.focused_chart_index = None
 if 'dashboard_generated' not in st.session_state:
     st.session_state.dashboard_generated = False
+if 'cross_filters' not in st.session_state:
+    st.session_state.cross_filters = {}  # column -> filter entry set by selecting on a dashboard chart
 if 'uploaded_file_name' not in st.session_state:
     st.session_state.uploaded_file_name = None
 # --- MANUAL EXPLORATION STATE ---
@@ -88,10 +354,12 @@ if 'me_color' not in st.session_state:
     st.session_state.me_color = "None"
 if 'me_type' not in st.session_state:
     st.session_state.me_type = "Scatter"
+if 'copilot_session_id' not in st.session_state:
+    st.session_state.copilot_session_id = uuid.uuid4().hex  # identifies this session to the Copilot rate limiter and shared scans
 if 'copilot_history' not in st.session_state:
-    st.session_state.copilot_history = [{"role": "assistant", "content": "Hello! I'm your Data Copilot. Ask me anything about your data."}]
-if 'copilot_usage_count' not in st.session_state:
-    st.session_state.copilot_usage_count = 0 
+    # Recent messages in memory, older ones moved to disk
+    st.session_state.copilot_history = ChatHistory(st.session_state.copilot_session_id,
+                                                   {"role": "assistant", "content": "Hello! I'm your Data Copilot. Ask me anything about your data."})
 
 
 # --- CUSTOM CSS ---
@@ -561,44 +829,54 @@ with st.sidebar:
     
     # --- FILTERS (Restored) ---
     # Apply filters globally to the DF if we are on Dashboard view
-    df_display = None
-    if st.session_state.df is not None:
-        df_display = st.session_state.df.copy() # Start with full data
+    dashboard_filters = ()  # active filter values, part of the dashboard's figure cache key
+    if st.session_state.dataset is not None:
+        shown_rows = len(get_active_df())  # Start with full data
         col_types = st.session_state.col_types
         
         if st.session_state.page == "Dashboard":
             st.markdown("### FILTERS")
+            profile = get_active_profile()
+            layout = dashboard_layout(col_types, profile)
+            date_col, filter_cols = layout["date_col"], layout["filter_cols"]
+            # Row bitmaps and the sorted date index are built once per dataset; filters AND bitmaps
+            filter_index = layout["index"]
+            mask = None
             
             # 1. Date Filter
-            if col_types['date']:
-                date_col = col_types['date'][0]
-                df_display[date_col] = pd.to_datetime(df_display[date_col], errors='coerce')
-                min_date = df_display[date_col].min()
-                max_date = df_display[date_col].max()
+            if date_col:
+                min_date = filter_index.date_min
+                max_date = filter_index.date_max
                 
                 if pd.notnull(min_date) and pd.notnull(max_date):
-                    start_date, end_date = st.date_input(
+                    date_range = st.date_input(
                         f"Date Range", 
                         [min_date, max_date],
                         min_value=min_date, max_value=max_date,
                         key="date_filter"
                     )
-                    if start_date and end_date:
-                        df_display = df_display[(df_display[date_col].dt.date >= start_date) & 
-                                                (df_display[date_col].dt.date <= end_date)]
+                    # The widget returns a single date while the user is still picking the end
+                    if len(date_range) == 2:
+                        start_date, end_date = date_range
+                        mask = filter_index.date_mask(start_date, end_date)
+                        if mask is not None:
+                            dashboard_filters += (("date", start_date, end_date),)
 
             # 2. Categorical Filters
-            filter_cols = [c for c in col_types['categorical'] if df_display[c].nunique() < 50]
-            filter_cols.sort(key=lambda x: df_display[x].nunique())
-            
-            for f_col in filter_cols[:3]: 
-                options = sorted(df_display[f_col].astype(str).unique())
+            for f_col in filter_cols: 
+                options = filter_index.options(f_col, mask)
                 selected = st.multiselect(f"{f_col}", options, key=f"filter_{f_col}")
                 if selected:
-                    df_display = df_display[df_display[f_col].astype(str).isin(selected)]
+                    dashboard_filters += ((f_col, tuple(sorted(selected))),)
+                    value_mask = filter_index.value_mask(f_col, selected)
+                    mask = value_mask if mask is None else mask & value_mask
+
+            if mask is not None:
+                # Only the count is needed here; build_dashboard selects the rows themselves
+                shown_rows = filter_index.count(mask)
             
             st.markdown("---")
-            st.caption(f"Showing {len(df_display)} rows")
+            st.caption(f"Showing {shown_rows} rows")
 
 
 import streamlit.components.v1 as components
@@ -1223,7 +1501,7 @@ if st.session_state.page == "Data Source":
     st.markdown("<br>", unsafe_allow_html=True)
     
     # 1. SHOW CURRENTLY LOADED DATA (If Exists)
-    if st.session_state.df is not None:
+    if st.session_state.dataset is not None:
         st.markdown(f"""
         <div style="background: linear-gradient(135deg, rgba(30, 41, 59, 0.8) 0%, rgba(15, 23, 42, 0.9) 100%); border: 1px solid rgba(34, 197, 94, 0.3); border-radius: 16px; padding: 1.5rem; margin-bottom: 2rem; display: flex; align-items: center; justify-content: space-between; box-shadow: 0 8px 32px rgba(0, 0, 0, 0.3);">
             <div style="display: flex; align-items: center; gap: 1rem;">
@@ -1234,7 +1512,7 @@ if st.session_state.page == "Data Source":
                 </div>
                 <div>
                     <h4 style="margin: 0; color: #f1f5f9; font-weight: 600;">Data Ready: {st.session_state.get('uploaded_file_name', 'Dataset')}</h4>
-                    <p style="margin: 0; color: #94a3b8; font-size: 0.9rem;">{len(st.session_state.df)} rows loaded successfully</p>
+                    <p style="margin: 0; color: #94a3b8; font-size: 0.9rem;">{len(get_active_df())} rows loaded successfully · {memory_summary(get_active_df())}</p>
                 </div>
             </div>
         </div>
@@ -1286,12 +1564,9 @@ if st.session_state.page == "Data Source":
          
          if st.button("Load Demo Data", type="primary", width="stretch"):
              with st.spinner("Loading global weather data..."):
-                 df = load_demo_data()
-                 if df is not None:
-                     st.session_state.df = df
-                     st.session_state.col_types = get_column_types(df)
-                     st.session_state.uploaded_file_name = "Global_Weather_Demo.xlsx"
-                     st.session_state.dashboard_generated = False
+                 handle = load_demo_dataset()
+                 if handle is not None:
+                     activate_dataset(handle)
                      
                      # AUTO GENERATE ANALYTICS - REMOVED as per user request
                      # st.session_state.page = "Auto Exploration"
@@ -1307,14 +1582,24 @@ if st.session_state.page == "Data Source":
             # Handle File Loading
             # If a file is uploaded, it ALWAYS takes precedence and overwrites
             if st.session_state.uploaded_file_name != uploaded_file.name:
-                df = load_data(uploaded_file)
-                if df is not None:
-                    st.session_state.df = df
-                    st.session_state.col_types = get_column_types(df)
-                    st.session_state.uploaded_file_name = uploaded_file.name
-                    st.session_state.dashboard_generated = False 
+                # Reuse the shared copy if any session already loaded this exact content
+                store = get_dataset_store()
+                key = cache_key(uploaded_file)
+                handle = store.acquire(key, uploaded_file.name)
+                if handle is None:
+                    progress_bar = st.progress(0.0, text=f"Reading {uploaded_file.name}...")
+                    df = load_data(
+                        uploaded_file,
+                        progress_callback=lambda frac, rows: progress_bar.progress(frac, text=f"Reading {uploaded_file.name}... {rows:,} rows"),
+                        key=key,
+                    )
+                    progress_bar.empty()
+                    if df is not None:
+                        handle = store.put(key, df, uploaded_file.name)
+                if handle is not None:
+                    activate_dataset(handle)
                     
-                    st.toast(f"File loaded! {len(df)} rows.", icon="✅")
+                    st.toast(f"File loaded! {len(handle.df)} rows.", icon="✅")
                     # Force rerun to show the "Data Ready" state we just built
                     st.rerun()
             
@@ -1324,7 +1609,7 @@ if st.session_state.page == "Data Source":
 
 elif st.session_state.page == "Auto Exploration":
     # --- AUTO EXPLORATION LOGIC (Integrated) ---
-    df_ae = st.session_state.df
+    df_ae = get_active_df()
     
     # --- PAGE SPECIFIC CSS (Chart Overflow Fix + Button Styling) ---
     st.markdown("""
@@ -1401,34 +1686,30 @@ elif st.session_state.page == "Auto Exploration":
                 
             st.subheader(f"🔍 Focused View: {chart_type}")
             
-            num_df = df_ae.select_dtypes(include=[np.number])
-            date_cols = df_ae.select_dtypes(include=['datetime', 'datetimetz']).columns
-            if len(date_cols) == 0:
-                for col in df_ae.select_dtypes(include='object').columns:
-                    try:
-                        df_ae[col] = pd.to_datetime(df_ae[col])
-                        date_cols = df_ae.select_dtypes(include=['datetime', 'datetimetz']).columns
-                    except: pass
+            # Reuse the cached scan; only recompute if it was evicted meanwhile
+            job = get_scan_registry().get(st.session_state.dataset.key)
+            scan = job.result if job is not None and job.status == "done" else run_scan(df_ae, get_active_profile())
 
             if chart_type == "Correlation Matrix":
-                if not num_df.empty and len(num_df.columns) > 1:
-                    fig = px.imshow(num_df.corr(), text_auto=True, color_continuous_scale='RdBu_r', aspect="auto")
+                if scan.corr is not None:
+                    fig = px.imshow(scan.corr, text_auto=True, color_continuous_scale='RdBu_r', aspect="auto")
                     fig.update_layout(height=800, autosize=True)
                     st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': True})
                     
             elif chart_type == "Distribution Analysis":
-                 if not num_df.empty:
-                    target_col = num_df.std().idxmax()
-                    fig = px.box(df_ae, y=target_col, points="outliers", title=f"Distribution of {target_col}")
+                 if scan.distribution_col is not None:
+                    target_col = scan.distribution_col
+                    fig = box_figure(scan.distribution, target_col, title=f"Distribution of {target_col}")
                     fig.update_layout(height=800, autosize=True)
                     st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': True})
                     
             elif chart_type == "Trend Analysis":
-                if len(date_cols) > 0 and not num_df.empty:
-                    date_col = date_cols[0]
-                    val_col = num_df.columns[0]
-                    df_trend = df_ae.sort_values(by=date_col)
-                    fig = px.line(df_trend, x=date_col, y=val_col, title=f"{val_col} over {date_col}")
+                if scan.date_col is not None and scan.numeric_cols:
+                    date_col = scan.date_col
+                    val_col = scan.numeric_cols[0]
+                    x, y = get_sorted_series(st.session_state.dataset.key, df_ae, date_col, val_col)
+                    window = zoom_window(x, key="ae_trend_zoom")
+                    fig = trend_figure(x, y, date_col, val_col, FULL_CHART_WIDTH_PX, window=window, title=f"{val_col} over {date_col}")
                     fig.update_layout(height=800, autosize=True)
                     st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': True})
         
@@ -1478,56 +1759,39 @@ elif st.session_state.page == "Auto Exploration":
             st.markdown("<br>", unsafe_allow_html=True)
 
             # --- ANALYSIS LOGIC & UI ---
+            # The scan runs once per dataset on a worker thread (see src/scan.py);
+            # reruns only re-render the cached ScanResult.
+            scan = None
             if st.session_state.auto_analysis_run:
+                job = get_scan_registry().start(st.session_state.dataset.key, df_ae, get_active_profile(),
+                                                session_id=st.session_state.copilot_session_id)
+
+                @st.fragment(run_every=0.5)
+                def render_scan_progress():
+                    if job.status != "running":
+                        st.rerun()
+                    st.progress(job.progress, text=f"Running advanced scan... {job.progress:.0%}")
+                    if st.button("Cancel Scan"):
+                        # Other sessions waiting on the same dataset's scan keep it running
+                        job.cancel(st.session_state.copilot_session_id)
+                        st.session_state.auto_analysis_run = False
+                        st.rerun()
+
+                if job.status == "running":
+                    render_scan_progress()
+                elif job.status == "done":
+                    scan = job.result
+                else:
+                    st.session_state.auto_analysis_run = False
+                    if job.status == "failed":
+                        st.error(f"Advanced scan failed: {job.error}")
+                    else:
+                        st.info("Advanced scan cancelled.")
+
+            if scan is not None:
                 
-                # 1. PREPARE DATA
-                num_df = df_ae.select_dtypes(include=[np.number])
-                date_cols = df_ae.select_dtypes(include=['datetime', 'datetimetz']).columns
-                if len(date_cols) == 0:
-                    for col in df_ae.select_dtypes(include='object').columns:
-                        try:
-                            df_ae[col] = pd.to_datetime(df_ae[col])
-                            date_cols = df_ae.select_dtypes(include=['datetime', 'datetimetz']).columns
-                        except:
-                            pass
-
-                # --- QUICK SUMMARY GENERATION ---
-                summary_points = []
-                
-                # A. Dimensions
-                summary_points.append(f"The dataset consists of **{len(df_ae)} rows** and **{len(df_ae.columns)} columns**.")
-                
-                # B. Time Context
-                if len(date_cols) > 0:
-                    d_col = date_cols[0]
-                    start_date = df_ae[d_col].min().strftime('%Y-%m-%d')
-                    end_date = df_ae[d_col].max().strftime('%Y-%m-%d')
-                    summary_points.append(f"It covers a time range from **{start_date}** to **{end_date}**.")
-                    
-                # C. Outliers
-                outlier_cols = []
-                if not num_df.empty:
-                    for col in num_df.columns[:5]: # Check top 5
-                        Q1 = num_df[col].quantile(0.25)
-                        Q3 = num_df[col].quantile(0.75)
-                        IQR = Q3 - Q1
-                        outliers = num_df[(num_df[col] < (Q1 - 1.5 * IQR)) | (num_df[col] > (Q3 + 1.5 * IQR))]
-                        if len(outliers) > 0:
-                            outlier_cols.append(col)
-                
-                if outlier_cols:
-                    summary_points.append(f"Potential outliers were detected in **{', '.join(outlier_cols[:3])}**.")
-                    
-                # D. Correlation
-                if not num_df.empty and len(num_df.columns) > 1:
-                    corr_matrix = num_df.corr().abs()
-                    upper = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool))
-                    max_corr = upper.max().max()
-                    if max_corr > 0.7:
-                         # Find pair
-                         stack = upper.stack()
-                         top_pair = stack.idxmax()
-                         summary_points.append(f"A strong relationship exists between **{top_pair[0]}** and **{top_pair[1]}**.")
+                # 1. SUMMARY
+                summary_points = scan.summary_points()
 
                 # RENDER SUMMARY - Dark Theme
                 st.markdown(f"""
@@ -1551,20 +1815,15 @@ elif st.session_state.page == "Auto Exploration":
                         
                         # A. OUTLIERS (IQR)
                         st.markdown("##### Outlier Detection")
-                        if not num_df.empty:
-                            for col in num_df.columns[:3]: 
-                                Q1 = num_df[col].quantile(0.25)
-                                Q3 = num_df[col].quantile(0.75)
-                                IQR = Q3 - Q1
-                                lower_bound = Q1 - 1.5 * IQR
-                                upper_bound = Q3 + 1.5 * IQR
-                                outliers = num_df[(num_df[col] < lower_bound) | (num_df[col] > upper_bound)]
+                        if scan.numeric_cols:
+                            for col in scan.numeric_cols[:3]: 
+                                outliers = scan.outliers[col]
                                 
-                                if len(outliers) > 0:
+                                if outliers["count"] > 0:
                                     st.markdown(f"""
                                     <div style="margin-bottom: 10px; padding-left: 10px; border-left: 3px solid #ef4444;">
-                                        <strong style="color: #f1f5f9;">{col}</strong>: Found <span style="color:#ef4444; font-weight: 600;">{len(outliers)} outliers</span> 
-                                        <span style="color: #94a3b8;">(Range: {num_df[col].min():.1f} - {num_df[col].max():.1f})</span>
+                                        <strong style="color: #f1f5f9;">{col}</strong>: Found <span style="color:#ef4444; font-weight: 600;">{outliers["count"]} outliers</span> 
+                                        <span style="color: #94a3b8;">(Range: {outliers["min"]:.1f} - {outliers["max"]:.1f})</span>
                                     </div>
                                     """, unsafe_allow_html=True)
                         else:
@@ -1574,15 +1833,9 @@ elif st.session_state.page == "Auto Exploration":
 
                         # B. CORRELATIONS
                         st.markdown("##### Strong Correlations")
-                        if not num_df.empty and len(num_df.columns) > 1:
-                            corr_matrix = num_df.corr().abs()
-                            upper = corr_matrix.where(np.triu(np.ones(corr_matrix.shape), k=1).astype(bool))
-                            strong_pairs = [(column, index, upper.loc[index, column]) 
-                                            for index, row in upper.iterrows() 
-                                            for column, val in row.items() if val > 0.7] 
-                            
-                            if strong_pairs:
-                                for (col1, col2, score) in strong_pairs[:5]:
+                        if scan.corr is not None:
+                            if scan.strong_pairs:
+                                for (col1, col2, score) in scan.strong_pairs[:5]:
                                     st.markdown(f"""
                                     <div style="margin-bottom: 8px;">
                                         <span class="insight-badge">Correlation {score:.2f}</span>
@@ -1598,10 +1851,10 @@ elif st.session_state.page == "Auto Exploration":
                         
                         # C. TRENDS
                         st.markdown("##### Temporal Patterns")
-                        if len(date_cols) > 0:
-                            date_col = date_cols[0]
+                        if scan.date_col is not None:
+                            date_col = scan.date_col
                             st.success(f"Detected time series data: **{date_col}**")
-                            time_span = df_ae[date_col].max() - df_ae[date_col].min()
+                            time_span = scan.date_max - scan.date_min
                             st.write(f"Data spans **{time_span.days} days**.")
                         else:
                             st.warning("No date column detected for trend analysis.")
@@ -1612,36 +1865,36 @@ elif st.session_state.page == "Auto Exploration":
                         st.subheader("📈 Smart Charts")
                         
                         # A. HEATMAP
-                        if not num_df.empty and len(num_df.columns) > 1:
+                        if scan.corr is not None:
                             c_head, c_btn = st.columns([4, 1])
                             c_head.caption("Correlation Matrix")
                             if c_btn.button("⤢", key="btn_exp_corr", help="Expand Correlation Matrix"):
                                 st.session_state.ae_focused_chart = "Correlation Matrix"
                                 st.rerun()
                                 
-                            fig_corr = px.imshow(num_df.corr(), text_auto=True, color_continuous_scale='RdBu_r', aspect="auto")
+                            fig_corr = px.imshow(scan.corr, text_auto=True, color_continuous_scale='RdBu_r', aspect="auto")
                             fig_corr.update_layout(height=300, margin=dict(l=0, r=0, t=0, b=0), autosize=True)
                             st.plotly_chart(fig_corr, use_container_width=True, config={'displayModeBar': False})
 
                         # B. DISTRIBUTION
                         st.divider()
-                        if not num_df.empty:
-                            target_col = num_df.std().idxmax()
+                        if scan.distribution_col is not None:
+                            target_col = scan.distribution_col
                             c_head, c_btn = st.columns([4, 1])
                             c_head.caption(f"Distribution of {target_col}")
                             if c_btn.button("⤢", key="btn_exp_dist", help="Expand Distribution Plot"):
                                  st.session_state.ae_focused_chart = "Distribution Analysis"
                                  st.rerun()
                                  
-                            fig_dist = px.box(df_ae, y=target_col, points="outliers")
+                            fig_dist = box_figure(scan.distribution, target_col)
                             fig_dist.update_layout(height=300, margin=dict(l=0, r=0, t=0, b=0), autosize=True)
                             st.plotly_chart(fig_dist, use_container_width=True, config={'displayModeBar': False})
                         
                         # C. TREND
-                        if len(date_cols) > 0 and not num_df.empty:
+                        if scan.date_col is not None and scan.numeric_cols:
                             st.divider()
-                            date_col = date_cols[0]
-                            val_col = num_df.columns[0]
+                            date_col = scan.date_col
+                            val_col = scan.numeric_cols[0]
                             
                             c_head, c_btn = st.columns([4, 1])
                             c_head.caption(f"Trend of {val_col}")
@@ -1649,12 +1902,12 @@ elif st.session_state.page == "Auto Exploration":
                                 st.session_state.ae_focused_chart = "Trend Analysis"
                                 st.rerun()
 
-                            df_trend = df_ae.sort_values(by=date_col)
-                            fig_trend = px.line(df_trend, x=date_col, y=val_col)
+                            x, y = get_sorted_series(st.session_state.dataset.key, df_ae, date_col, val_col)
+                            fig_trend = trend_figure(x, y, date_col, val_col, HALF_CHART_WIDTH_PX)
                             fig_trend.update_layout(height=250, margin=dict(l=0, r=0, t=0, b=0), autosize=True)
                             st.plotly_chart(fig_trend, use_container_width=True, config={'displayModeBar': False})
 
-            else:
+            elif not st.session_state.auto_analysis_run:
                 # Placeholder State
                 c1, c2 = st.columns(2)
                 with c1:
@@ -1693,6 +1946,14 @@ elif st.session_state.page == "Data Copilot":
                 display: flex;
                 flex-direction: column;
             }
+            .st-key-copilot_chat_card {
+                background: white;
+                border-radius: 16px;
+                padding: 1.5rem;
+                border: 1px solid #e2e8f0;
+                box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.05);
+                margin-bottom: 1rem;
+            }
             .card-header-row {
                 display: flex;
                 align-items: center;
@@ -1767,6 +2028,20 @@ elif st.session_state.page == "Data Copilot":
             .copilot-table tr:last-child td {
                 border-bottom: none;
             }
+            
+            /* Result previews inside chat bubbles */
+            .copilot-result-table {
+                border-collapse: collapse;
+                margin-top: 6px;
+                font-size: 0.8rem;
+                background-color: white;
+            }
+            .copilot-result-table th, .copilot-result-table td {
+                padding: 4px 8px;
+                border-bottom: 1px solid #e2e8f0;
+                text-align: left;
+                white-space: nowrap;
+            }
         </style>
         
         <div class="copilot-header">
@@ -1788,97 +2063,55 @@ elif st.session_state.page == "Data Copilot":
             if "pending_query" not in st.session_state:
                 st.session_state.pending_query = None
 
-            # 1. PROCESS PENDING INPUT (Main Body - Safe for st.spinner)
-            if st.session_state.pending_query:
-                user_input = st.session_state.pending_query
-                st.session_state.pending_query = None # Consume it
-                
-                # Add user message
-                st.session_state.copilot_history.append({"role": "user", "content": user_input})
-                
-                # Call Gemini API if within limits
-                if "copilot_usage_count" not in st.session_state:
-                     st.session_state.copilot_usage_count = 0
-                     
-                MAX_SESSION_QUERY_LIMIT = 10
-                
-                if st.session_state.copilot_usage_count >= MAX_SESSION_QUERY_LIMIT:
-                    answer = f"🔒 **Session Limit Reached ({MAX_SESSION_QUERY_LIMIT}/{MAX_SESSION_QUERY_LIMIT})**\\n\\nTo ensure availability for all testers, the AI feature is limited per session. Please refresh the page to start a new session."
-                else:
-                    st.session_state.copilot_usage_count += 1
-                    with st.spinner(f"Thinking... (Query {st.session_state.copilot_usage_count}/{MAX_SESSION_QUERY_LIMIT})"):
-                        answer = ask_copilot(st.session_state.df, user_input)
-                
-                # Add assistant message
-                st.session_state.copilot_history.append({"role": "assistant", "content": answer})
-
-            # 2. INPUT CALLBACK (Only updates state, no rendering)
+            # 1. INPUT CALLBACK (Only updates state, no rendering)
             def handle_submit():
                 st.session_state.pending_query = st.session_state.copilot_input
                 st.session_state.copilot_input = ""
 
-            # Build Chat HTML
-            chat_html = ""
-            for msg in st.session_state.copilot_history:
-                content = msg["content"]
-                display_html = ""
-                
-                # Handle structured response (dict) vs legacy string
-                if isinstance(content, dict):
-                    main_text = content.get("content", "")
-                    code_text = content.get("code", "")
-                    main_text = main_text.replace("\n", "<br>") 
-                    
-                    if content.get("type") == "code" and code_text:
-                        # Styled Code Block using HTML <details>
-                        code_html = f"""
-                        <div style="margin-top: 8px;">
-                            <details style="border: 1px solid #e2e8f0; border-radius: 8px; overflow: hidden; background-color: white;">
-                                <summary style="padding: 6px 12px; cursor: pointer; background-color: #f8fafc; font-size: 0.8rem; color: #64748b; font-weight: 500; outline: none; user-select: none;">
-                                    \U00002728 Thinking Process
-                                </summary>
-                                <div style="background-color: #0f172a; color: #f8fafc; padding: 12px; font-family: 'Consolas', 'Monaco', monospace; font-size: 0.8rem; overflow-x: auto; border-top: 1px solid #e2e8f0;">
-                                    <pre style="margin: 0; white-space: pre-wrap;">{code_text}</pre>
-                                </div>
-                            </details>
-                        </div>
-                        """
-                        display_html = f"<div>{main_text}</div>{code_html}"
-                    else:
-                        display_html = main_text
-                else:
-                    # Legacy string
-                    display_html = str(content).replace("\n", "<br>")
-
-                if msg["role"] == "user":
-                    chat_html += f'<div class="chat-bubble" style="background-color: #e0f2fe; color: #0369a1; align-self: flex-end; margin-left: auto; width: fit-content; max-width: 80%; text-align: right;">{display_html}</div>'
-                else:
-                    chat_html += f'<div class="chat-bubble" style="background-color: #f1f5f9; color: #334155; align-self: flex-start; max-width: 90%;">{display_html}</div>'
-
-            st.markdown(f"""
-                <div class="copilot-card">
-                    <div class="card-header-row">
-                        <div class="header-icon-box bg-purple">\U0001F916</div>
-                        <div class="card-title-text">Chat Assistant</div>
-                    </div>
-                    <div id="chat-container" style="flex-grow: 1; overflow-y: auto; display: flex; flex-direction: column; gap: 10px; padding-right: 5px;">
-                        {chat_html}
-                    </div>
-                </div>
-            """, unsafe_allow_html=True)
-            
-            # Auto-scroll Logic
-            components.html("""
-            <script>
-                var container = window.parent.document.getElementById("chat-container");
-                if (container) {
-                    container.scrollTop = container.scrollHeight;
-                }
-            </script>
-            """, height=0, width=0)
+            # 2. CHAT CARD: a fixed-height list that follows new messages. Each message is its own
+            # element with its HTML rendered once, so a rerun only adds what is new.
+            history = st.session_state.copilot_history
+            with st.container(key="copilot_chat_card"):
+                st.markdown(CHAT_CARD_HEADER, unsafe_allow_html=True)
+                with st.container(height=CHAT_HEIGHT_PX, border=False, autoscroll=True):
+                    if history.spilled and st.toggle(f"Show {history.spilled} earlier messages", key="copilot_show_earlier"):
+                        for msg in history.earlier():
+                            st.markdown(chat_message_html(msg), unsafe_allow_html=True)
+                    for msg in history:
+                        st.markdown(cached_message_html(msg), unsafe_allow_html=True)
+
+                    # 3. PROCESS PENDING INPUT, streaming the answer into a live bubble as it arrives
+                    if st.session_state.pending_query:
+                        user_input = st.session_state.pending_query
+                        st.session_state.pending_query = None # Consume it
+                        
+                        # Add user message
+                        user_msg = {"role": "user", "content": user_input}
+                        history.append(user_msg)
+                        st.markdown(cached_message_html(user_msg), unsafe_allow_html=True)
+                        live = st.empty()
+                        live.markdown(chat_message_html({"role": "assistant", "content": "Thinking..."}), unsafe_allow_html=True)
+                        
+                        # Call Gemini API; the global and per-session rate limits are applied inside
+                        answer = None
+                        for event in ask_copilot_stream(get_active_df(), user_input, st.session_state.dataset.key,
+                                                        session_id=st.session_state.copilot_session_id):
+                            if event["type"] == "partial":
+                                live.markdown(chat_message_html({"role": "assistant", "content": event["text"] + "▌"}), unsafe_allow_html=True)
+                            else:
+                                answer = event["response"]
+                        
+                        # Add assistant message
+                        answer_msg = {"role": "assistant", "content": answer}
+                        history.append(answer_msg)
+                        live.markdown(cached_message_html(answer_msg), unsafe_allow_html=True)
             
             # Input - simulating positioning at bottom of card
             st.text_input("Ask about your data...", placeholder="Ask about your data...", key="copilot_input", label_visibility="collapsed", on_change=handle_submit)
+            render_result_explorer(st.session_state.copilot_history)
+            cache_stats = get_response_cache().stats()
+            if cache_stats["hits"] + cache_stats["misses"]:
+                st.caption(f"Response cache: {cache_stats['hits']} of {cache_stats['hits'] + cache_stats['misses']} questions answered from cache ({cache_stats['hit_rate']:.0%})")
             st.markdown("<div style='margin-bottom: 2rem;'></div>", unsafe_allow_html=True)
 
         # Call the fragment
@@ -1886,9 +2119,9 @@ elif st.session_state.page == "Data Copilot":
 
     with c2:
         # Prepare content for the card
-        if st.session_state.df is not None:
+        if st.session_state.dataset is not None:
             # Convert head to HTML with custom class
-            table_html = st.session_state.df.head().to_html(classes="copilot-table", border=0)
+            table_html = get_active_df().head().to_html(classes="copilot-table", border=0)
         else:
             table_html = "<div style='color: #94a3b8; padding: 1rem; text-align: center;'>Please upload a dataset in 'Data Source' to preview.</div>"
             
@@ -1917,7 +2150,7 @@ if st.session_state.page == "Manual Exploration":
     </div>
     """, unsafe_allow_html=True)
 
-    df_me = st.session_state.df
+    df_me = get_active_df()
     if not check_data_loaded():
         pass
     else:
@@ -2018,7 +2251,7 @@ if st.session_state.page == "Manual Exploration":
                 if x_axis != "None" and y_axis != "None":
                     try:
                         if chart_type == "Scatter":
-                            fig = px.scatter(df_me, x=x_axis, y=y_axis, color=color_col if color_col != "None" else None)
+                            fig = scatter_figure(df_me, x_axis, y_axis, color=color_col if color_col != "None" else None)
                         elif chart_type == "Line":
                             fig = px.line(df_me, x=x_axis, y=y_axis, color=color_col if color_col != "None" else None)
                         elif chart_type == "Bar":
@@ -2064,8 +2297,7 @@ elif st.session_state.page == "Dashboard":
     if not check_data_loaded():
         pass
     else:
-        # USE FILTERED DATA
-        df = df_display # This comes from sidebar logic
+        # Sidebar filters arrive as dashboard_filters; rows are selected per chart
         col_types = st.session_state.col_types
         
         if not st.session_state.dashboard_generated:
@@ -2087,8 +2319,13 @@ elif st.session_state.page == "Dashboard":
                 st.rerun()
         else:
             # DASHBOARD IS GENERATED
-            kpi_cols = identify_key_metrics(df, col_types)
-            charts = generate_dashboard_charts(df, col_types, kpi_cols)
+            profile = get_active_profile()
+            # Charts are cached per dataset, filters and chart spec, so reruns that change
+            # neither (Enlarge, Back, other widgets) and the selected chart itself are reused
+            figure_cache = get_figure_cache()
+            layout = dashboard_layout(col_types, profile)
+            dashboard = build_dashboard(layout, col_types, profile, dashboard_filters, st.session_state.cross_filters)
+            kpi_cols, charts = dashboard["kpi_cols"], dashboard["charts"]
             
             # Focused View
             if st.session_state.focused_chart_index is not None:
@@ -2096,7 +2333,17 @@ elif st.session_state.page == "Dashboard":
                  if 0 <= idx < len(charts):
                      chart_data = charts[idx]
                      st.markdown(f"## 🔍 View: {chart_data.get('title', 'Chart')}")
-                     fig = chart_data['fig']
+                     # Cached figures are shared: resize a copy
+                     fig = go.Figure(chart_data['fig'])
+                     if "trend" in chart_data:
+                         # Rebuild the trend at full width, for the zoomed window only
+                         date_col, metric = chart_data["trend"]
+                         filters = chart_data["filters"]
+                         x, y = figure_cache.get_or_build(
+                             (st.session_state.dataset.key, filters, "trend_series", date_col, metric),
+                             lambda: sorted_series(AggregationPlan(dashboard_rows(layout, filters).frame([date_col, metric]), [date_col], metric).sums(date_col).reset_index(), date_col, metric))
+                         window = zoom_window(x, key="dash_trend_zoom")
+                         fig = trend_figure(x, y, date_col, metric, FULL_CHART_WIDTH_PX, window=window, title=f"Trend: {metric}")
                      fig.update_layout(height=700, margin=dict(t=50, l=50, r=50, b=50))
                      st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': True})
             
@@ -2106,8 +2353,21 @@ elif st.session_state.page == "Dashboard":
                 if kpi_cols:
                     cols = st.columns(min(len(kpi_cols), 4))
                     for i, col in enumerate(kpi_cols[:4]):
-                        val = df[col].sum()
-                        cols[i].metric(col, format_number(val))
+                        cols[i].metric(col, format_number(dashboard["kpi_totals"][col]))
+                
+                # Cross-filters set by selecting slices, bars or a date range on the charts
+                if st.session_state.cross_filters:
+                    active = []
+                    for entry in st.session_state.cross_filters.values():
+                        if entry[0] == "date":
+                            active.append(f"{layout['date_col']}: {entry[1]} → {entry[2]}")
+                        else:
+                            active.append(f"{entry[0]}: {', '.join(entry[1])}")
+                    c_info, c_clear = st.columns([4, 1])
+                    c_info.caption("Cross-filters: " + " · ".join(active))
+                    if c_clear.button("Clear cross-filters", key="clear_cross_filters"):
+                        st.session_state.cross_filters = {}
+                        st.rerun()
                 
                 st.markdown("<br>", unsafe_allow_html=True)
                 
@@ -2119,7 +2379,14 @@ elif st.session_state.page == "Dashboard":
                     for j, chart_data in enumerate(row_charts):
                         chart_index = i + j
                         with cols[j]:
-                            st.plotly_chart(chart_data['fig'], use_container_width=True, config={'displayModeBar': False})
+                            if chart_data["dim"] is not None:
+                                # Selecting here cross-filters the other charts on this chart's column
+                                chart_key = f"xf_{chart_data['kind']}"
+                                st.plotly_chart(chart_data['fig'], use_container_width=True, config={'displayModeBar': False},
+                                                key=chart_key, on_select=lambda k=chart_key, c=chart_data: apply_chart_selection(k, c),
+                                                selection_mode=("box", "points") if chart_data["kind"] != "pie" else "points")
+                            else:
+                                st.plotly_chart(chart_data['fig'], use_container_width=True, config={'displayModeBar': False})
                             if st.button(f"🔍 Enlarge", key=f"btn_{chart_index}"): #Enlarge Button for viewing the chart in Full-View.
                                 st.session_state.focused_chart_index = chart_index
                                 st.rerun()
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+
+def factorize(series):
+    """
+    Returns (codes, uniques) for a column, with missing values coded -1.
+    Categorical columns reuse their existing codes; other columns are factorized sorted.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories
+    codes, uniques = pd.factorize(series, sort=True, use_na_sentinel=True)
+    return codes, uniques
+
+class AggregationPlan:
+    """
+    Group-by sums and row counts of one metric over several dimensions, computed together.
+    The metric is converted to float once and each dimension is factorized once; every sum
+    and count is then a single np.bincount over the shared codes. Rows with a missing
+    dimension value are dropped and missing metric values add nothing to a sum, like
+    df.groupby(dim, observed=True)[metric].sum().
+    """
+    def __init__(self, df, dims, metric=None):
+        self.metric = metric
+        weights = None
+        if metric is not None:
+            weights = df[metric].to_numpy(dtype='float64', na_value=np.nan)
+            weights = np.where(np.isnan(weights), 0.0, weights)
+        self.groups = {}
+        for dim in dict.fromkeys(d for d in dims if d is not None):
+            codes, uniques = factorize(df[dim])
+            # Shift by one so missing values (-1) land in bin 0, which is dropped
+            shifted = codes.astype(np.int64) + 1
+            counts = np.bincount(shifted, minlength=len(uniques) + 1)[1:]
+            observed = counts > 0
+            table = pd.DataFrame({"count": counts[observed]}, index=pd.Index(uniques[observed], name=dim))
+            if weights is not None:
+                table["sum"] = np.bincount(shifted, weights=weights, minlength=len(uniques) + 1)[1:][observed]
+            self.groups[dim] = table
+
+    def sums(self, dim) -> pd.Series:
+        """Sum of the metric per value of `dim`, named after the metric."""
+        return self.groups[dim]["sum"].rename(self.metric)
+
+    def counts(self, dim) -> pd.Series:
+        """Row count per value of `dim`, like value_counts() without the zero categories."""
+        return self.groups[dim]["count"].rename("Count")
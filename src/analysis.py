@@ -1,37 +1,174 @@
+import warnings
 import pandas as pd
 import numpy as np
+from pandas.tseries.api import guess_datetime_format
 from sklearn.ensemble import RandomForestRegressor, RandomForestClassifier
 from sklearn.preprocessing import LabelEncoder
 
+# Number of values probed per text column before committing to a full date parse
+DATE_SAMPLE_SIZE = 100
+
+def _is_text_dtype(dtype):
+    # Checks the dtype only; is_string_dtype on an object *column* scans its values
+    return (pd.api.types.is_object_dtype(dtype)
+            or pd.api.types.is_string_dtype(dtype)
+            or isinstance(dtype, pd.CategoricalDtype))
+
+def _date_sample(series):
+    """Up to DATE_SAMPLE_SIZE non-null values spread evenly over the column."""
+    step = max(len(series) // DATE_SAMPLE_SIZE, 1)
+    sample = series.iloc[::step].dropna()
+    if sample.empty:
+        sample = series.dropna().head(DATE_SAMPLE_SIZE)
+    return sample
+
+def _infer_date_format(sample):
+    """
+    Returns a strftime format that parses every value in `sample`, or None.
+    Formats are guessed from the first value, month-first before day-first, so an ambiguous
+    column (every day <= 12) always resolves the same way whatever was parsed before.
+    """
+    first = sample.iloc[0]
+    if not isinstance(first, str):
+        return None
+
+    candidates = []
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for dayfirst in (False, True):
+            fmt = guess_datetime_format(first, dayfirst=dayfirst)
+            if fmt and fmt not in candidates:
+                candidates.append(fmt)
+
+    for fmt in candidates:
+        if pd.to_datetime(sample, format=fmt, errors='coerce').notna().all():
+            return fmt
+    return None
+
+# Zero-padded numeric strftime fields: directive -> (to_datetime unit, width)
+_FIXED_WIDTH_FIELDS = {"%Y": ("year", 4), "%m": ("month", 2), "%d": ("day", 2),
+                       "%H": ("hour", 2), "%M": ("minute", 2), "%S": ("second", 2)}
+
+def _parse_fixed_width_dates(series, fmt):
+    """
+    Vectorized parser for zero-padded numeric formats such as %d/%m/%Y %H:%M.
+    Reads the digits straight out of the column's bytes instead of calling strptime per value.
+    Returns None when the column does not match the layout so the caller can fall back.
+    """
+    fields, literals, width = [], [], 0
+    i = 0
+    while i < len(fmt):
+        token = fmt[i:i + 2]
+        if token in _FIXED_WIDTH_FIELDS:
+            unit, size = _FIXED_WIDTH_FIELDS[token]
+            fields.append((unit, width, size))
+            width += size
+            i += 2
+        elif fmt[i] == '%':
+            return None
+        else:
+            literals.append((width, ord(fmt[i])))
+            width += 1
+            i += 1
+    units = {unit for unit, _, _ in fields}
+    if not {"year", "month"} <= units or series.hasnans:
+        return None
+
+    try:
+        if not (series.str.len() == width).all():
+            return None
+        chars = np.asarray(series, dtype=f"S{width}").view(np.uint8).reshape(len(series), width)
+    except (UnicodeEncodeError, ValueError, AttributeError, TypeError):
+        return None
+    if any((chars[:, pos] != code).any() for pos, code in literals):
+        return None
+
+    parts = {}
+    for unit, pos, size in fields:
+        digits = chars[:, pos:pos + size].astype(np.int64) - 48
+        if ((digits < 0) | (digits > 9)).any():
+            return None
+        parts[unit] = digits @ (10 ** np.arange(size - 1, -1, -1))
+    parts.setdefault("day", 1)
+    parsed = pd.to_datetime(pd.DataFrame(parts, index=series.index), errors='raise')
+    return parsed.rename(series.name)
+
+def _parse_dates(series, fmt):
+    """Parses a full column with an explicit format, preferring the vectorized fixed-width path."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Parse each distinct value once and broadcast through the category codes
+        categories = _parse_dates(pd.Series(series.cat.categories.astype(str)), fmt)
+        codes = series.cat.codes.to_numpy()
+        values = categories.to_numpy()[codes]
+        values[codes == -1] = np.datetime64("NaT")
+        return pd.Series(values, index=series.index, name=series.name)
+    parsed = _parse_fixed_width_dates(series, fmt)
+    if parsed is None:
+        parsed = pd.to_datetime(series, format=fmt, errors='raise')
+    return parsed
+
+def detect_date_columns(df):
+    """
+    Finds text columns that hold dates and parses them.
+    Each column is probed on a small sample first; only confirmed candidates are parsed in
+    full, with the inferred explicit format, and any unparseable value rejects the column.
+    Returns {column: (format, parsed datetime Series)}.
+    """
+    detected = {}
+    for col in df.columns:
+        series = df[col]
+        if not _is_text_dtype(series.dtype):
+            continue
+        sample = _date_sample(series)
+        if sample.empty:
+            continue
+        fmt = _infer_date_format(sample.astype(str) if isinstance(series.dtype, pd.CategoricalDtype) else sample)
+        if fmt is None:
+            continue
+        try:
+            detected[col] = (fmt, _parse_dates(series, fmt))
+        except (ValueError, TypeError):
+            pass
+    return detected
+
 def get_column_types(df):
     """
     Detects numerical, categorical, and date columns.
+    Columns already typed as datetime count as dates; text columns are checked with
+    detect_date_columns and the inferred formats are returned under "date_formats".
     """
     numerical_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-    categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
-    date_cols = []
-    
+    categorical_cols = [c for c in df.columns if _is_text_dtype(df[c].dtype)]
+
     # Heuristic for dates
-    for col in categorical_cols:
-        try:
-            pd.to_datetime(df[col], errors='raise')
-            date_cols.append(col)
-        except:
-            pass
-            
+    detected = detect_date_columns(df)
+    date_cols = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c].dtype) or c in detected]
+
     # Remove date columns from categorical
     categorical_cols = [c for c in categorical_cols if c not in date_cols]
     
     return {
         "numerical": numerical_cols,
         "categorical": categorical_cols,
-        "date": date_cols
+        "date": date_cols,
+        "date_formats": {col: fmt for col, (fmt, _) in detected.items()}
     }
 
-def identify_key_metrics(df, col_types):
+def apply_column_types(df):
+    """
+    Converts detected date columns to datetime dtype.
+    Run once at load so every page reads a typed frame instead of re-parsing dates.
+    """
+    detected = detect_date_columns(df)
+    if not detected:
+        return df
+    return df.assign(**{col: parsed for col, (_, parsed) in detected.items()})
+
+def identify_key_metrics(df, col_types, profile=None):
     """
     Identifies 3 important columns to show as KPIs.
     Prioritizes columns with names like 'Sales', 'Profit', 'Revenue'.
+    Cardinalities come from the dataset's ColumnProfile when one is given.
     """
     candidates = col_types['numerical']
     priority_keywords = ['sales', 'revenue', 'profit', 'amount', 'cost', 'price', 'total']
@@ -42,13 +179,42 @@ def identify_key_metrics(df, col_types):
         score = 0
         if any(k in col.lower() for k in priority_keywords):
             score += 2
-        if df[col].nunique() > 10: # Likely continuous, not ID
+        unique = profile.nunique(col) if profile is not None else df[col].nunique()
+        if unique > 10: # Likely continuous, not ID
             score += 1
         scored.append((col, score))
         
     scored.sort(key=lambda x: x[1], reverse=True)
     return [x[0] for x in scored[:3]]
 
+# Outlier points shipped with a box plot; the most extreme ones are kept
+MAX_BOX_OUTLIERS = 2_000
+
+def box_stats(values):
+    """
+    Tukey box-plot summary of a numeric array: quartiles (linear, like Plotly), whiskers at
+    the most extreme points within 1.5 IQR, and the points beyond them.
+    Returns None if there are no non-missing values.
+    """
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    low, high = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    inside = values[(values >= low) & (values <= high)]
+    outliers = values[(values < low) | (values > high)]
+    if len(outliers) > MAX_BOX_OUTLIERS:
+        distance = np.maximum(low - outliers, outliers - high)
+        outliers = outliers[np.argpartition(distance, -MAX_BOX_OUTLIERS)[-MAX_BOX_OUTLIERS:]]
+    return {
+        "count": len(values), "mean": float(values.mean()),
+        "q1": float(q1), "median": float(median), "q3": float(q3),
+        "lowerfence": float(inside.min()), "upperfence": float(inside.max()),
+        "outliers": outliers,
+    }
+
 def calculate_correlations(df):
     numeric_df = df.select_dtypes(include=[np.number])
     if numeric_df.empty:
@@ -61,7 +227,7 @@ def analyze_dependencies(df, target_col):
         X = df_clean.drop(columns=[target_col])
         y = df_clean[target_col]
         
-        for col in X.select_dtypes(include=['object']).columns:
+        for col in X.select_dtypes(include=['object', 'category']).columns:
             le = LabelEncoder()
             X[col] = le.fit_transform(X[col].astype(str))
             
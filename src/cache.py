@@ -0,0 +1,85 @@
+import os
+import hashlib
+import pandas as pd
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Parsed uploads are stored here as Parquet, one file per content hash
+CACHE_DIR = os.getenv("DATASET_CACHE_DIR", os.path.join(os.getcwd(), ".cache", "datasets"))
+# Oldest snapshots are pruned once the cache directory grows past this size
+CACHE_MAX_MB = int(os.getenv("DATASET_CACHE_MAX_MB", "4096"))
+# Bump when the parsing/preprocessing pipeline changes so stale snapshots are ignored
+CACHE_FORMAT_VERSION = 5
+
+HASH_BLOCK_SIZE = 8 * 1024 * 1024
+
+def content_hash(file) -> str:
+    """
+    Returns the SHA-256 of a file-like object's bytes, read in blocks.
+    The stream position is rewound so the file can still be parsed afterwards.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+        digest.update(block)
+    file.seek(0)
+    return digest.hexdigest()
+
+def cache_key(file) -> str:
+    """Cache key for an upload: content hash + file type + pipeline version."""
+    extension = os.path.splitext(file.name)[1].lower().lstrip('.')
+    return f"{content_hash(file)}-{extension}-v{CACHE_FORMAT_VERSION}"
+
+def _snapshot_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}.parquet")
+
+def read_snapshot(key: str):
+    """
+    Returns the cached DataFrame for `key`, or None on a miss.
+    Hits refresh the file's mtime so pruning evicts least recently used snapshots first.
+    """
+    path = _snapshot_path(key)
+    if not os.path.exists(path):
+        return None
+    try:
+        df = pd.read_parquet(path)
+        os.utime(path)
+        return df
+    except Exception as e:
+        print(f"Ignoring unreadable dataset snapshot {path}: {e}")
+        return None
+
+def write_snapshot(key: str, df: pd.DataFrame) -> bool:
+    """
+    Stores `df` as a Parquet snapshot under `key`.
+    Returns False (and leaves no partial file) if the frame cannot be written as Parquet,
+    e.g. mixed-type object columns.
+    """
+    path = _snapshot_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df.to_parquet(tmp_path)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"Could not cache dataset snapshot: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    prune_snapshots()
+    return True
+
+def prune_snapshots(max_mb=CACHE_MAX_MB, directory=CACHE_DIR, suffix='.parquet'):
+    """Deletes least recently used snapshots until the cache fits in `max_mb`."""
+    try:
+        entries = [os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(suffix)]
+    except FileNotFoundError:
+        return
+    entries.sort(key=os.path.getmtime)
+    total = sum(os.path.getsize(p) for p in entries)
+    budget = max_mb * 1024 * 1024
+    while entries and total > budget:
+        oldest = entries.pop(0)
+        total -= os.path.getsize(oldest)
+        os.remove(oldest)
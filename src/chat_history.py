@@ -0,0 +1,92 @@
+import os
+import time
+import pickle
+import weakref
+from dotenv import load_dotenv
+from src.cache import prune_snapshots
+
+load_dotenv()
+
+# Messages a session keeps in memory; older ones are moved to disk
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("COPILOT_HISTORY_MESSAGES", "40"))
+CHAT_DIR = os.getenv("CHAT_DIR", os.path.join(os.getcwd(), ".cache", "chat"))
+# Chat files untouched for this long belong to ended sessions and are deleted...
+CHAT_TTL_S = int(os.getenv("COPILOT_HISTORY_TTL_S", "86400"))
+# ...and the oldest are deleted once the directory passes this size
+CHAT_MAX_MB = int(os.getenv("COPILOT_HISTORY_MAX_MB", "64"))
+
+def prune_chat_files(ttl=CHAT_TTL_S, max_mb=CHAT_MAX_MB):
+    """Deletes chat history files older than `ttl` seconds, then the oldest past `max_mb`."""
+    try:
+        names = [f for f in os.listdir(CHAT_DIR) if f.endswith('.pkl')]
+    except FileNotFoundError:
+        return
+    cutoff = time.time() - ttl
+    for name in names:
+        path = os.path.join(CHAT_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+    prune_snapshots(max_mb, CHAT_DIR, '.pkl')
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+class ChatHistory:
+    """
+    A session's Copilot conversation. The most recent `max_messages` messages stay in memory;
+    older ones are appended to a per-session file under CHAT_DIR and only read back when the
+    user asks to see them. The file is deleted when the session's history is released; files
+    left behind (e.g. by a crash) expire after CHAT_TTL_S, and the directory is capped at
+    CHAT_MAX_MB. Each in-memory message caches its rendered HTML under "html", so a rerun
+    renders only messages that are new.
+    """
+    def __init__(self, session_id, greeting, max_messages=CHAT_HISTORY_MAX_MESSAGES):
+        self.path = os.path.join(CHAT_DIR, f"{session_id}.pkl")
+        self.max_messages = max_messages
+        self.messages = [greeting]
+        self.spilled = 0  # messages on disk
+        # Session state is dropped when the session ends, which releases this object
+        weakref.finalize(self, _remove_file, self.path)
+        prune_chat_files()
+
+    def __iter__(self):
+        return iter(self.messages)
+
+    def __len__(self):
+        return self.spilled + len(self.messages)
+
+    def append(self, message):
+        self.messages.append(message)
+        excess = len(self.messages) - self.max_messages
+        if excess > 0:
+            self._spill(excess)
+
+    def _spill(self, count):
+        older, self.messages = self.messages[:count], self.messages[count:]
+        try:
+            os.makedirs(CHAT_DIR, exist_ok=True)
+            with open(self.path, "ab") as f:
+                for message in older:
+                    pickle.dump({k: v for k, v in message.items() if k != "html"}, f, protocol=pickle.HIGHEST_PROTOCOL)
+            self.spilled += count
+        except Exception as e:
+            print(f"Could not move chat history to disk: {e}")
+            return
+        prune_chat_files()
+
+    def earlier(self) -> list:
+        """Messages moved to disk, oldest first (fewer if the file was pruned)."""
+        messages = []
+        try:
+            with open(self.path, "rb") as f:
+                while True:
+                    messages.append(pickle.load(f))
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            pass
+        return messages
@@ -1,127 +1,322 @@
 
 import os
-import io
+import re
+import uuid
+import hashlib
+import threading
+import unicodedata
 import pandas as pd
 import time
-import random
 import streamlit as st
-from collections import deque
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from google import genai
+from src.gemini_client import get_gemini_client, MAX_RETRIES, is_retryable
+from src.profiler import ColumnProfile, get_column_profile
+from src.sandbox import get_sandbox_pool
+from src.results import get_result_store, as_frame, table_summary
 
 # Load environment variables (API Key)
 load_dotenv()
 
 def get_api_client():
-    """Initializes the Gemini API client."""
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        return None
-    try:
-        # Initialize the client with the API key
-        client = genai.Client(api_key=api_key)
-        return client
-    except Exception as e:
-        print(f"Error initializing Gemini client: {e}")
-        return None
+    """The shared Gemini client, created once per process (None without an API key)."""
+    return get_gemini_client()
+
+# Shared AI quota per hour, and the part of it a single session may use
+GLOBAL_QUERY_LIMIT = int(os.getenv("COPILOT_GLOBAL_LIMIT", "50"))
+SESSION_QUERY_LIMIT = int(os.getenv("COPILOT_SESSION_LIMIT", "10"))
+RATE_WINDOW_S = 3600
+
+class TokenBucket:
+    """
+    Holds up to `capacity` tokens, refilled continuously so a full bucket's worth comes
+    back over `window` seconds. Checking and taking a token is O(1).
+    """
+    def __init__(self, capacity, window):
+        self.capacity = capacity
+        self.rate = capacity / window
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is available now); call after refill."""
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
 
-@st.cache_resource
 class GlobalRateLimiter:
     """
-    Tracks API usage across all sessions using Streamlit's cache_resource.
-    Implements a sliding window rate limiter.
+    Rate limit for Gemini calls, shared by all sessions through get_global_rate_limiter.
+    A global token bucket caps the whole server and a per-session bucket stops one session
+    from using the shared quota up. The check is lock-protected and O(1); idle sessions'
+    buckets are dropped oldest-first as new requests arrive.
     """
-    def __init__(self, max_requests=50, time_window=3600):
-        self.max_requests = max_requests
-        self.time_window = time_window # 1 hour in seconds
-        self.requests = []
+    def __init__(self, max_requests=GLOBAL_QUERY_LIMIT, time_window=RATE_WINDOW_S, session_requests=SESSION_QUERY_LIMIT):
+        self.time_window = time_window
+        self.session_requests = session_requests
+        self._lock = threading.Lock()
+        self._global = TokenBucket(max_requests, time_window)
+        self._sessions = OrderedDict()  # session id -> TokenBucket, least recently used first
+
+    def acquire(self, session_id=None) -> tuple:
+        """
+        Takes one request from the global and the session bucket if both allow it.
+        Returns (allowed, retry_after_seconds, scope) with scope "global" or "session"
+        naming the limit that was hit.
+        """
+        now = time.monotonic()
+        with self._lock:
+            # A bucket unused for a whole window is full again, so forgetting it changes nothing
+            while self._sessions:
+                oldest = next(iter(self._sessions.values()))
+                if now - oldest.updated < self.time_window:
+                    break
+                self._sessions.popitem(last=False)
+
+            self._global.refill(now)
+            session = None
+            if session_id is not None:
+                session = self._sessions.get(session_id)
+                if session is None:
+                    session = TokenBucket(self.session_requests, self.time_window)
+                    self._sessions[session_id] = session
+                session.refill(now)
+                self._sessions.move_to_end(session_id)
+
+            if session is not None and session.wait_time() > 0:
+                return False, session.wait_time(), "session"
+            if self._global.wait_time() > 0:
+                return False, self._global.wait_time(), "global"
+            self._global.tokens -= 1
+            if session is not None:
+                session.tokens -= 1
+            return True, 0.0, None
 
     def check_and_log(self) -> bool:
         """
         Checks if request is allowed. 
         Returns True if allowed, False if limit exceeded.
         """
-        now = time.time()
-        
-        # Prune requests older than time_window
-        # We create a new list for thread safety simplicity in Streamlit
-        self.requests = [req_time for req_time in self.requests if now - req_time < self.time_window]
-        
-        if len(self.requests) >= self.max_requests:
-            return False
-            
-        self.requests.append(now)
-        return True
+        return self.acquire()[0]
 
+@st.cache_resource
 def get_global_rate_limiter():
     return GlobalRateLimiter()
 
-def prepare_context(df: pd.DataFrame) -> str:
+def format_wait(seconds) -> str:
+    if seconds < 90:
+        return f"{max(1, round(seconds))} seconds"
+    return f"{round(seconds / 60)} minutes"
+
+# Answers kept for repeated questions: at most this many, each for at most this long
+RESPONSE_CACHE_SIZE = int(os.getenv("COPILOT_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL_S = int(os.getenv("COPILOT_CACHE_TTL_S", "86400"))
+
+def normalize_query(query: str) -> str:
+    """
+    Case and spacing-insensitive form of a question, without trailing "?", "!" or ".".
+    Operators, signs and decimal points are kept: "> 30" and "< 30" are different questions.
+    """
+    text = " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+    return text.rstrip("?!. ")
+
+def schema_fingerprint(df: pd.DataFrame) -> str:
+    """Hash of the column names and dtypes; generated code depends only on these."""
+    schema = "|".join(f"{col}:{dtype}" for col, dtype in df.dtypes.items())
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+
+class ResponseCache:
+    """
+    Process-wide cache of Copilot answers keyed on (normalized query, schema fingerprint).
+    Only code answers are stored, as the generated code, which is re-run against the current
+    data on a hit, so the model is only asked once per question and schema. Text answers may
+    quote one dataset's values and are not cached. Bounded by size (least recently used
+    dropped first) and by age.
+    """
+    def __init__(self, max_entries=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (response, stored_at)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, response):
+        with self._lock:
+            self._entries[key] = (response, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+@st.cache_resource
+def get_response_cache() -> ResponseCache:
+    return ResponseCache()
+
+# Size of the dataset summary sent with each question, in (approximate) tokens
+CONTEXT_TOKEN_BUDGET = int(os.getenv("COPILOT_CONTEXT_TOKENS", "1500"))
+CHARS_PER_TOKEN = 4
+# Longest category value quoted in the summary
+MAX_VALUE_CHARS = 40
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def _quote(value) -> str:
+    text = str(value)
+    if len(text) > MAX_VALUE_CHARS:
+        text = text[:MAX_VALUE_CHARS - 3] + "..."
+    return repr(text)
+
+def _number(value) -> str:
+    return f"{value:.6g}"
+
+def _column_line(col, record, top_values, top_n) -> str:
+    """One summary line per column; `top_n` most frequent values are quoted for categoricals."""
+    line = f"- {col} ({record['dtype']})"
+    if record["count"] == 0:
+        return line + ": all missing"
+    details = []
+    if record["kind"] == "numeric":
+        details.append(f"{_number(record['min'])} to {_number(record['max'])}, mean {_number(record['mean'])}")
+        details.append(f"{record['unique']} distinct")
+    elif record["kind"] == "datetime":
+        details.append(f"{record['min']} to {record['max']}")
+    else:
+        details.append(f"{record['unique']} distinct")
+        if top_n and top_values is not None and len(top_values):
+            shown = ", ".join(_quote(v) for v in top_values.index[:top_n])
+            details.append(f"top: {shown}" + (", ..." if record["unique"] > top_n else ""))
+    if record["nulls"]:
+        details.append(f"{record['nulls']} missing")
+    return f"{line}: {'; '.join(details)}"
+
+def prepare_context(df: pd.DataFrame, profile=None, budget=CONTEXT_TOKEN_BUDGET) -> str:
     """
-    Prepares a context string summarizing the dataframe.
-    Includes columns, simple stats, and a sample.
+    Prepares a context string summarizing the dataframe within `budget` tokens:
+    shape, then one line per column with its type, range or most frequent values and
+    missing count, then a sample of rows if there is room. Statistics are read from
+    `profile` (a ColumnProfile) when given. Detail is dropped (fewer quoted values, then
+    none, then fewer columns) until the summary fits.
     """
     if df is None or df.empty:
         return "No data available."
-    
-    buffer = io.StringIO()
-    
-    buffer.write(f"Dataset Shape: {df.shape}\n\n")
-    
-    buffer.write("Columns and Data Types:\n")
-    for col, dtype in df.dtypes.items():
-        buffer.write(f"- {col}: {dtype}\n")
-    buffer.write("\n")
-    
-    buffer.write("Missing Values:\n")
-    missing = df.isnull().sum()
-    if missing.sum() == 0:
-        buffer.write("None\n")
+    if profile is None:
+        profile = ColumnProfile(df)
+
+    header = f"Dataset Shape: {df.shape[0]} rows x {df.shape[1]} columns\n\nColumns:\n"
+    records = profile.stats.to_dict(orient="index")
+    columns = list(df.columns)
+
+    def column_block(top_n, limit):
+        lines = [_column_line(col, records[col], profile.top_values.get(col), top_n) for col in columns[:limit]]
+        if limit < len(columns):
+            lines.append(f"- ... and {len(columns) - limit} more columns: {', '.join(map(str, columns[limit:]))}")
+        return "\n".join(lines)
+
+    for top_n in (5, 3, 0):
+        context = header + column_block(top_n, len(columns))
+        if estimate_tokens(context) <= budget:
+            break
     else:
-        for col, count in missing[missing > 0].items():
-            buffer.write(f"- {col}: {count} missing\n")
-    buffer.write("\n")
-    
-    buffer.write("Summary Statistics (Numerical):\n")
-    try:
-        desc = df.describe().to_markdown()
-        buffer.write(desc)
-    except Exception as e:
-        buffer.write(f"Could not generate stats: {e}")
-        try:
-             buffer.write(df.describe().to_string())
-        except:
-             pass
-    buffer.write("\n\n")
-    
-    buffer.write("First 3 Rows (Sample):\n")
+        # Too many columns: keep full lines for as many as fit and name the rest
+        limit = len(columns)
+        while limit > 0 and estimate_tokens(context) > budget:
+            limit //= 2
+            context = header + column_block(0, limit)
+        # Even the list of names can be too long for very wide data
+        context = context[:budget * CHARS_PER_TOKEN]
+
     try:
         sample = df.head(3).to_markdown(index=False)
-        buffer.write(sample)
-    except:
-        buffer.write("Could not generate sample.")
-        
-    return buffer.getvalue()
+        with_sample = f"{context}\n\nFirst 3 Rows (Sample):\n{sample}"
+        if estimate_tokens(with_sample) <= budget:
+            context = with_sample
+    except Exception:
+        pass
+    return context
 
-def execute_generated_code(code: str, df: pd.DataFrame) -> str:
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_dataset_context(dataset_key, _df, budget=CONTEXT_TOKEN_BUDGET) -> str:
+    """prepare_context for a shared dataset, built once per fingerprint from its cached ColumnProfile."""
+    return prepare_context(_df, get_column_profile(dataset_key, _df), budget)
+
+def frame_key(df: pd.DataFrame) -> str:
+    """Sandbox key of a frame with no dataset key: its schema, shape and a hash of its values."""
+    try:
+        values = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    except TypeError:
+        # Unhashable cells (e.g. lists): a key no other frame can match
+        return f"frame-{uuid.uuid4().hex}"
+    digest = hashlib.sha256(values.tobytes()).hexdigest()[:16]
+    return f"frame-{schema_fingerprint(df)}-{df.shape[0]}x{df.shape[1]}-{digest}"
+
+def run_generated_code(code: str, df: pd.DataFrame, dataset_key=None) -> dict:
     """
-    Executes the generated pandas code safely.
+    Runs the generated pandas code in a sandbox worker process, under the pool's time and
+    memory limits, so a runaway query cannot stall or exhaust the server.
+    Returns the pool's reply: {"ok": True, "result": ...} or {"ok": False, "error": ...}.
     """
-    try:
-        # Create a local safe scope
-        local_scope = {"df": df, "pd": pd, "result": None}
-        
-        # Execute the code
-        exec(code, {}, local_scope)
-        
-        # Get the result
-        result = local_scope.get("result")
-        if result is None:
-            return "The code ran but did not yield a 'result' variable."
-            
-        return str(result)
-    except Exception as e:
-        return f"Error executing code: {e}"
+    # The key names the dataset's shared file, so a frame without one is keyed by its content
+    return get_sandbox_pool().run(dataset_key or frame_key(df), df, code)
+
+# Longest result text shown in the chat; tables are stored in full and previewed instead
+MAX_RESULT_CHARS = 2000
+
+def format_execution(reply: dict) -> str:
+    """Chat text for a sandbox reply."""
+    if not reply["ok"]:
+        return f"Error executing code: {reply['error']}"
+
+    result = reply["result"]
+    if result is None:
+        return "The code ran but did not yield a 'result' variable."
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        rows, cols = as_frame(result).shape
+        if "rows" in reply:
+            # Cut in the sandbox; only the first rows were sent back
+            return f"The result is a table of {reply['rows']:,} rows × {cols:,} columns; the first {rows:,} rows are kept."
+        return f"The result is a table of {rows:,} rows × {cols:,} columns."
+    text = str(result)
+    if len(text) > MAX_RESULT_CHARS:
+        text = text[:MAX_RESULT_CHARS] + f"... ({len(text) - MAX_RESULT_CHARS:,} more characters)"
+    return text
+
+def execution_response(reply: dict, code: str) -> dict:
+    """
+    Code answer for a sandbox reply. A DataFrame or Series result is put in the result
+    store, and only its bounded summary (see table_summary) goes into the answer.
+    """
+    response = {"type": "code", "content": format_execution(reply), "code": code}
+    if reply["ok"] and isinstance(reply["result"], (pd.DataFrame, pd.Series)):
+        frame = as_frame(reply["result"])
+        response["result"] = table_summary(frame, get_result_store().put(frame))
+    return response
 
 def clean_code_block(text: str) -> str:
     """Extracts code from markdown code blocks."""
@@ -131,30 +326,49 @@ def clean_code_block(text: str) -> str:
         return text.split("```")[1].split("```")[0].strip()
     return text.strip()
 
-def ask_copilot(df: pd.DataFrame, user_query: str) -> dict:
+# Runs generated code while the rest of a streamed response is still arriving
+_code_runner = ThreadPoolExecutor(max_workers=4, thread_name_prefix="copilot-code")
+
+# A complete fenced code block in a (partial) response
+CODE_BLOCK = re.compile(r"```(?:python)?[^\n]*\n(.*?)```", re.DOTALL)
+
+def ask_copilot_stream(df: pd.DataFrame, user_query: str, dataset_key=None, session_id=None):
     """
-    Analyzes the user query and dataset to generate an answer.
-    Returns specific structure:
+    Analyzes the user query and dataset to generate an answer, streamed.
+    Yields {"type": "partial", "text": ...} with the response text received so far, then
+    {"type": "done", "response": ...} with the answer:
     {
         "type": "code" | "text",
         "content": str, # The final answer text
         "code": str     # The generated code (optional)
     }
+    Generated code starts running in the sandbox as soon as its closing fence arrives,
+    while the rest of the response is still streaming.
     """
+    # Repeated questions on the same schema reuse the cached answer without calling the model
+    cache = get_response_cache()
+    cache_key = (normalize_query(user_query), schema_fingerprint(df))
+    cached = cache.get(cache_key)
+    if cached is not None:
+        reply = run_generated_code(cached["code"], df, dataset_key)
+        yield {"type": "done", "response": {**execution_response(reply, cached["code"]), "cached": True}}
+        return
+
     client = get_api_client()
     if not client:
-        return {"type": "text", "content": "⚠️ Gemini API Key not found. Please set GEMINI_API_KEY in .env file."}
+        yield {"type": "done", "response": {"type": "text", "content": "⚠️ Gemini API Key not found. Please set GEMINI_API_KEY in .env file."}}
+        return
     
-    # Context now focuses on structure rather than content
-    dtypes_summary = str(df.dtypes)
-    columns = list(df.columns)
+    # Column types, ranges and frequent values, built once per dataset and sized to the token budget
+    if dataset_key is not None:
+        context = get_dataset_context(dataset_key, df)
+    else:
+        context = prepare_context(df)
     
     prompt = f"""
     You are an expert Python Data Analyst.
     
-    Dataset Columns: {columns}
-    Data Types:
-    {dtypes_summary}
+    {context}
     
     User Query: "{user_query}"
     
@@ -164,6 +378,7 @@ def ask_copilot(df: pd.DataFrame, user_query: str) -> dict:
        - Do NOT complain that you can't see the data.
        - Do NOT output "I cannot answer".
        - Write a Pandas script that assumes 'df' is loaded.
+       - Use the exact column names, types and category values given in the summary above.
        - Store the result in a variable named 'result'.
        - Wrap the code in a ```python block.
     
@@ -175,47 +390,50 @@ def ask_copilot(df: pd.DataFrame, user_query: str) -> dict:
     
     # --- GLOBAL RATE LIMIT CHECK ---
     limiter = get_global_rate_limiter()
-    if not limiter.check_and_log():
-        return {
-            "type": "text", 
-            "content": "⚠️ **System Limit Reached**: The shared AI demo quota (50 queries/hour) has been exceeded for the testing server. Please try again later."
-        }
+    allowed, retry_after, scope = limiter.acquire(session_id)
+    if not allowed:
+        if scope == "session":
+            message = f"🔒 **Session Limit Reached**: To ensure availability for all testers, each session can ask {SESSION_QUERY_LIMIT} questions per hour. Please try again in {format_wait(retry_after)}."
+        else:
+            message = f"⚠️ **System Limit Reached**: The shared AI demo quota ({GLOBAL_QUERY_LIMIT} queries/hour) has been exceeded for the testing server. Please try again in {format_wait(retry_after)}."
+        yield {"type": "done", "response": {"type": "text", "content": message}}
+        return
     
     # --- API CALL ---
-    max_retries = 3
-
-    base_delay = 1
-    
-    for attempt in range(max_retries):
-        try:
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=prompt
-            )
-            raw_text = response.text
-            print(f"DEBUG: Copilot Response: {raw_text}")
-            
-            # Check if code was generated
-            if "```python" in raw_text or "```" in raw_text:
-                code = clean_code_block(raw_text)
-                execution_result = execute_generated_code(code, df)
-                return {
-                    "type": "code",
-                    "content": execution_result,
-                    "code": code
-                }
-            else:
-                return {
-                    "type": "text",
-                    "content": raw_text
-                }
-                
-        except Exception as e:
-            if "503" in str(e) or "429" in str(e): # Service Unavailable or Rate Limit
-                if attempt < max_retries - 1:
-                    sleep_time = base_delay * (2 ** attempt) + random.uniform(0, 1)
-                    time.sleep(sleep_time)
-                    continue
-            return {"type": "text", "content": f"Error connecting to Gemini API (Attempt {attempt+1}/{max_retries}): {str(e)}"}
+    # Retries, backoff and hedging of slow requests happen on the client's event loop
+    raw_text = ""
+    execution = None  # sandbox run started when the code block closed
+    try:
+        for text in client.stream(prompt):
+            raw_text += text
+            yield {"type": "partial", "text": raw_text}
+            if execution is None:
+                match = CODE_BLOCK.search(raw_text)
+                if match:
+                    code = match.group(1).strip()
+                    execution = _code_runner.submit(run_generated_code, code, df, dataset_key)
+    except Exception as e:
+        if is_retryable(e):
+            message = f"Error: Failed to connect to Gemini API after {MAX_RETRIES} attempts: {str(e)}"
+        else:
+            message = f"Error connecting to Gemini API: {str(e)}"
+        yield {"type": "done", "response": {"type": "text", "content": message}}
+        return
+    print(f"DEBUG: Copilot Response: {raw_text}")
     
-    return {"type": "text", "content": "Error: Failed to connect to Gemini API after multiple attempts."}
+    # Check if code was generated (an unterminated block is run once the stream ends)
+    if execution is None and "```" in raw_text:
+        code = clean_code_block(raw_text)
+        execution = _code_runner.submit(run_generated_code, code, df, dataset_key)
+    if execution is not None:
+        reply = execution.result()
+        # Only code that ran is worth replaying for the next asker
+        if reply["ok"]:
+            cache.put(cache_key, {"type": "code", "code": code})
+        response = execution_response(reply, code)
+    else:
+        response = {
+            "type": "text",
+            "content": raw_text
+        }
+    yield {"type": "done", "response": response}
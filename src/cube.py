@@ -0,0 +1,123 @@
+import os
+import numpy as np
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+from src.aggregation import factorize
+
+load_dotenv()
+
+# Set DASHBOARD_CUBE=false to always aggregate the dashboard from raw rows
+CUBE_ENABLED = os.getenv("DASHBOARD_CUBE", "true").lower() != "false"
+# No cube is kept when it would have more cells than this fraction of the rows
+CUBE_MAX_CELL_RATIO = 0.25
+
+class DataCube:
+    """
+    Pre-aggregated dashboard data for one dataset: row counts and sums of the KPI columns
+    for every observed combination of the date (at day grain) and a few low-cardinality
+    categoricals. Filtered KPI totals and group-by sums are then answered from the cells
+    instead of the raw rows. Missing dimension values get a cell slot of their own, so the
+    totals still include those rows.
+    """
+    def __init__(self, df, date_col, dims, measures):
+        self.rows = len(df)
+        self.date_col = date_col
+        self.dims = ([date_col] if date_col else []) + [d for d in dims if d != date_col]
+        self.measures = list(measures)
+        self.labels = {}  # dim -> Index of values; code len(labels) means missing
+        self.text_labels = {}  # dim -> values as str, matched against sidebar selections
+        self.daily = True  # dates carry no time of day, so a day-grain trend equals the raw one
+
+        all_codes, sizes = [], []
+        for dim in self.dims:
+            series = df[dim]
+            if dim == date_col:
+                if getattr(series.dt, 'tz', None) is not None:
+                    series = series.dt.tz_localize(None)
+                days = series.dt.floor('D')
+                self.daily = bool((days.isna() | (days == series)).all())
+                series = days
+            codes, uniques = factorize(series)
+            codes = np.where(codes < 0, len(uniques), codes)
+            self.labels[dim] = pd.Index(uniques, name=dim)
+            self.text_labels[dim] = np.asarray(uniques.astype(str))
+            all_codes.append(codes)
+            sizes.append(len(uniques) + 1)
+
+        cell_ids = np.ravel_multi_index(all_codes, sizes) if all_codes else np.zeros(self.rows, dtype=np.int64)
+        cells, inverse = np.unique(cell_ids, return_inverse=True)
+        self.cells = len(cells)
+        self.codes = dict(zip(self.dims, np.unravel_index(cells, sizes))) if all_codes else {}
+        self.counts = np.bincount(inverse, minlength=self.cells)
+        self.sums = {}
+        for measure in self.measures:
+            values = df[measure].to_numpy(dtype='float64', na_value=np.nan)
+            self.sums[measure] = np.bincount(inverse, weights=np.where(np.isnan(values), 0.0, values), minlength=self.cells)
+
+    def select(self, filters, metric=None):
+        """
+        CubeSelection for the sidebar's filter tuple (("date", start, end) and
+        (column, values) entries), or None if a filter is on a column the cube lacks.
+        `metric` is the measure its sums() report.
+        """
+        mask = np.ones(self.cells, dtype=bool)
+        for f in filters:
+            if f[0] == "date" and self.date_col:
+                days = self.labels[self.date_col]
+                allowed = (days >= pd.Timestamp(f[1])) & (days <= pd.Timestamp(f[2]))
+                dim = self.date_col
+            elif f[0] in self.labels:
+                dim = f[0]
+                allowed = np.isin(self.text_labels[dim], list(f[1]))
+            else:
+                return None
+            allowed = np.append(np.asarray(allowed, dtype=bool), False)  # missing values never match
+            mask &= allowed[self.codes[dim]]
+        return CubeSelection(self, mask, metric)
+
+class CubeSelection:
+    """The cells of a DataCube that pass the filters; same sums/counts interface as AggregationPlan."""
+    def __init__(self, cube, mask, metric=None):
+        self.cube = cube
+        self.mask = mask
+        self.metric = metric
+
+    def covers(self, dims, metric=None) -> bool:
+        """True if every grouping in `dims` (and `metric`) can be answered from the cube."""
+        for dim in dims:
+            if dim is None:
+                continue
+            if dim not in self.cube.labels or (dim == self.cube.date_col and not self.cube.daily):
+                return False
+        return metric is None or metric in self.cube.sums
+
+    def total(self, measure):
+        return float(self.cube.sums[measure][self.mask].sum())
+
+    def _group(self, dim, weights):
+        labels = self.cube.labels[dim]
+        codes = self.cube.codes[dim][self.mask]
+        counts = np.bincount(codes, weights=self.cube.counts[self.mask], minlength=len(labels) + 1)[:-1]
+        values = counts if weights is None else np.bincount(codes, weights=weights[self.mask], minlength=len(labels) + 1)[:-1]
+        observed = counts > 0
+        return pd.Series(values[observed], index=labels[observed])
+
+    def sums(self, dim) -> pd.Series:
+        return self._group(dim, self.cube.sums[self.metric]).rename(self.metric)
+
+    def counts(self, dim) -> pd.Series:
+        return self._group(dim, None).astype(np.int64).rename("Count")
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_data_cube(dataset_key, _df, date_col, dims, measures):
+    """
+    DataCube for a shared dataset, built once per fingerprint and layout.
+    Returns None when disabled or when the cube would not be much smaller than the data.
+    """
+    if not CUBE_ENABLED or len(_df) == 0:
+        return None
+    cube = DataCube(_df, date_col, dims, measures)
+    if cube.cells > len(_df) * CUBE_MAX_CELL_RATIO:
+        return None
+    return cube
@@ -1,14 +1,33 @@
 import pandas as pd
 import os
 import streamlit as st
+from src.cache import content_hash
+from src.loader import compact_dtypes
+from src.analysis import apply_column_types
+
+DEMO_FILE_NAME = "Global_Weather_Demo.xlsx"
+
+def _demo_file_path():
+    # Define path relative to the app root
+    # Assuming app.py is in root, data is in root/data
+    return os.path.join(os.getcwd(), 'data', 'Global_Weather_Analytics_500.xlsx')
+
+def demo_data_key():
+    """
+    Content fingerprint of the demo file, used to share one loaded copy across sessions.
+    Returns None if the file is missing.
+    """
+    file_path = _demo_file_path()
+    if not os.path.exists(file_path):
+        return None
+    with open(file_path, 'rb') as f:
+        return f"{content_hash(f)}-demo"
 
 def load_demo_data():
     """
     Loads the pre-existing demo dataset from data/Global_Weather_Analytics_500.xlsx
     """
-    # Define path relative to the app root
-    # Assuming app.py is in root, data is in root/data
-    file_path = os.path.join(os.getcwd(), 'data', 'Global_Weather_Analytics_500.xlsx')
+    file_path = _demo_file_path()
     
     if not os.path.exists(file_path):
         st.error(f"Demo data file not found at: {file_path}")
@@ -17,7 +36,7 @@ def load_demo_data():
     try:
         # Load Excel file
         df = pd.read_excel(file_path)
-        return df
+        return compact_dtypes(apply_column_types(df))
     except Exception as e:
         st.error(f"Error loading demo data: {str(e)}")
         return None
@@ -0,0 +1,43 @@
+import os
+import sys
+import plotly.graph_objects as go
+import streamlit as st
+from dotenv import load_dotenv
+from src.lru import ByteLRU
+
+load_dotenv()
+
+# Built figures are evicted (least recently used first) once their serialized size passes this
+FIGURE_CACHE_MAX_MB = int(os.getenv("FIGURE_CACHE_MAX_MB", "256"))
+
+def _nbytes(value) -> int:
+    """Approximate size of a cached value; figures count as their serialized JSON."""
+    if isinstance(value, go.Figure):
+        return len(value.to_json())
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+class FigureCache(ByteLRU):
+    """
+    Process-wide, thread-safe LRU cache of built charts, bounded by their serialized size.
+    Keys combine the dataset fingerprint, the active filter values and the chart spec, so a
+    rerun that does not change any of them reuses the figures without aggregating again.
+    Cached figures are shared between sessions: copy one (go.Figure(fig)) before changing it.
+    """
+    def __init__(self, max_mb=FIGURE_CACHE_MAX_MB):
+        super().__init__(max_mb * 1024 * 1024, _nbytes)
+
+    def get_or_build(self, key, build):
+        """Returns the cached value for `key`, calling `build()` and caching its result on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.put(key, value)
+        return value
+
+@st.cache_resource
+def get_figure_cache() -> FigureCache:
+    return FigureCache()
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from src.aggregation import factorize
+
+class FilterIndex:
+    """
+    Row index for the Dashboard's sidebar filters, built once per dataset.
+    Each filterable categorical keeps a packed bitmap (one bit per row) for every value, and
+    the date column is kept sorted with its row positions, so a date range is two
+    searchsorted lookups. Combining filters is a bitwise AND of bitmaps; only the final
+    selection is turned into row positions. `code_cols` (the dashboard's cross-filter
+    columns, which may have many values) keep their factorized codes instead of bitmaps.
+    """
+    def __init__(self, df, date_col=None, filter_cols=(), code_cols=()):
+        self.rows = len(df)
+        self.date_col = date_col
+        self.date_min = self.date_max = None
+        if date_col is not None:
+            dates = df[date_col]
+            if getattr(dates.dt, 'tz', None) is not None:
+                dates = dates.dt.tz_localize(None)  # compare wall-clock days, like .dt.date
+            values = dates.to_numpy(dtype='datetime64[ns]')
+            valid = np.flatnonzero(~np.isnat(values))
+            order = valid[np.argsort(values[valid], kind='stable')]
+            self._date_order = order
+            self._sorted_dates = values[order]
+            if len(order):
+                self.date_min = pd.Timestamp(self._sorted_dates[0])
+                self.date_max = pd.Timestamp(self._sorted_dates[-1])
+
+        self._bitmaps = {}  # column -> {value as str: packed bitmap}
+        for col in filter_cols:
+            codes, uniques = factorize(df[col])
+            labels = uniques.astype(str)
+            bitmaps = {}
+            for code in np.unique(codes[codes >= 0]):
+                bitmaps[labels[code]] = np.packbits(codes == code)
+            self._bitmaps[col] = dict(sorted(bitmaps.items()))
+
+        self._codes = {}  # column -> (codes, values as str)
+        for col in code_cols:
+            if col not in self._bitmaps:
+                codes, uniques = factorize(df[col])
+                self._codes[col] = (codes.astype(np.int32), np.asarray(uniques.astype(str)))
+
+    def all_rows(self):
+        """Bitmap selecting every row."""
+        return np.packbits(np.ones(self.rows, dtype=bool))
+
+    def date_mask(self, start_date, end_date):
+        """
+        Bitmap of rows whose date falls on a day from `start_date` to `end_date` inclusive,
+        or None if that is every row (the widget's default full range).
+        """
+        start = np.datetime64(pd.Timestamp(start_date), 'ns')
+        stop = np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1), 'ns')
+        lo, hi = np.searchsorted(self._sorted_dates, [start, stop], side='left')
+        if hi - lo == self.rows:
+            return None
+        selected = np.zeros(self.rows, dtype=bool)
+        selected[self._date_order[lo:hi]] = True
+        return np.packbits(selected)
+
+    def value_mask(self, col, values):
+        """Bitmap of rows whose `col` (as text) is any of `values`."""
+        if col in self._codes:
+            codes, labels = self._codes[col]
+            allowed = np.append(np.isin(labels, list(values)), False)  # code -1 (missing) never matches
+            return np.packbits(allowed[codes])
+        mask = np.zeros((self.rows + 7) // 8, dtype=np.uint8)
+        for value in values:
+            bitmap = self._bitmaps[col].get(value)
+            if bitmap is not None:
+                mask |= bitmap
+        return mask
+
+    def select(self, filters):
+        """
+        Bitmap for a filter tuple of ("date", start, end) and (column, values) entries,
+        or None if it selects every row.
+        """
+        mask = None
+        for f in filters:
+            m = self.date_mask(f[1], f[2]) if f[0] == "date" else self.value_mask(f[0], f[1])
+            if m is not None:
+                mask = m if mask is None else mask & m
+        return mask
+
+    def options(self, col, mask=None):
+        """Sorted values of `col` present in the rows selected by `mask` (all rows if None)."""
+        bitmaps = self._bitmaps[col]
+        if mask is None:
+            return list(bitmaps)
+        return [value for value, bitmap in bitmaps.items() if np.any(bitmap & mask)]
+
+    def count(self, mask) -> int:
+        return int(np.count_nonzero(np.unpackbits(mask, count=self.rows)))
+
+    def positions(self, mask):
+        """Row positions selected by `mask`, in dataset order."""
+        return np.flatnonzero(np.unpackbits(mask, count=self.rows))
+
+class FilteredView:
+    """
+    Lazy row selection over a shared, read-only dataset: the base frame plus the selected
+    row positions (None = every row). Nothing is copied until frame() is asked for specific
+    columns, and then only those columns of the selected rows are taken.
+    """
+    def __init__(self, df, positions=None):
+        self.df = df
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.df) if self.positions is None else len(self.positions)
+
+    @property
+    def is_filtered(self):
+        return self.positions is not None
+
+    def frame(self, columns=None) -> pd.DataFrame:
+        """The selected rows of `columns` (all columns if None) as a DataFrame."""
+        df = self.df if columns is None else self.df[list(columns)]
+        return df if self.positions is None else df.take(self.positions)
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_filter_index(dataset_key, _df, date_col, filter_cols, code_cols=()) -> FilterIndex:
+    """FilterIndex for a shared dataset, built once per fingerprint and filter layout."""
+    return FilterIndex(_df, date_col, filter_cols, code_cols)
@@ -0,0 +1,166 @@
+import os
+import queue
+import random
+import asyncio
+import threading
+from collections import deque
+import numpy as np
+import streamlit as st
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+
+load_dotenv()
+
+GEMINI_MODEL = "gemini-2.5-flash"
+# Send requests to another endpoint instead, e.g. the local stub (python -m src.gemini_stub)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+# Set COPILOT_HEDGE=false to never send a second copy of a slow request
+HEDGE_ENABLED = os.getenv("COPILOT_HEDGE", "true").lower() != "false"
+# A request is hedged once it has waited this percentile of recent first-token latencies
+HEDGE_PERCENTILE = float(os.getenv("COPILOT_HEDGE_PERCENTILE", "95"))
+# No hedging until this many latencies have been seen
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+MAX_RETRIES = 3
+BASE_DELAY_S = 1
+
+_DONE = object()
+
+def is_retryable(error) -> bool:
+    """Service Unavailable or Rate Limit errors, which are worth retrying after a pause."""
+    return getattr(error, "code", None) in (429, 503) or "503" in str(error) or "429" in str(error)
+
+class AsyncGeminiClient:
+    """
+    Process-wide Gemini client. The SDK client (and its HTTP connection pool) is created once,
+    and every request runs as a coroutine on one event loop thread, so a slow or retrying
+    request holds no thread of its own. Requests still waiting for their first token after
+    the HEDGE_PERCENTILE of recent first-token latencies get a second copy sent; whichever
+    answers first is streamed and the other is cancelled. Retries on 503/429 back off with
+    asyncio.sleep.
+    """
+    def __init__(self, api_key, base_url=GEMINI_BASE_URL, hedge=HEDGE_ENABLED, percentile=HEDGE_PERCENTILE):
+        http_options = types.HttpOptions(base_url=base_url) if base_url else None
+        self._client = genai.Client(api_key=api_key, http_options=http_options)
+        self.hedge = hedge
+        self.percentile = percentile
+        self._latencies = deque(maxlen=LATENCY_WINDOW)  # seconds to first token, loop thread only
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="gemini-client", daemon=True).start()
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging a request, or None if hedging is off or still warming up."""
+        latencies = list(self._latencies)
+        if not self.hedge or len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return float(np.percentile(latencies, self.percentile))
+
+    def stats(self) -> dict:
+        delay = self.hedge_delay()
+        return {"requests": self.requests, "hedged": self.hedged, "hedge_wins": self.hedge_wins,
+                "hedge_after_s": delay}
+
+    async def _open(self, prompt):
+        """Starts one streaming request and waits for its first chunk."""
+        start = self._loop.time()
+        stream = await self._client.aio.models.generate_content_stream(model=GEMINI_MODEL, contents=prompt)
+        try:
+            first = await anext(stream)
+        except StopAsyncIteration:
+            first = None
+        except BaseException:
+            await stream.aclose()
+            raise
+        return stream, first, self._loop.time() - start
+
+    async def _first_response(self, prompt):
+        """Stream and first chunk of the earliest of the original and (if it is slow) hedged request."""
+        original = asyncio.ensure_future(self._open(prompt))
+        tasks = [original]
+        delay = self.hedge_delay()
+        if delay is not None:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedged += 1
+                tasks.append(asyncio.ensure_future(self._open(prompt)))
+        error = None
+        winner = None
+        try:
+            while tasks and winner is None:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                    elif winner is None:
+                        winner = task
+                    else:
+                        await task.result()[0].aclose()  # both answered at once
+        finally:
+            for task in tasks:
+                task.cancel()
+        if winner is None:
+            raise error
+        stream, first, latency = winner.result()
+        self._latencies.append(latency)
+        if winner is not original:
+            self.hedge_wins += 1
+        return stream, first
+
+    async def _stream(self, prompt, out):
+        """Puts the response text chunks on `out`, then _DONE (or the exception that ended it)."""
+        self.requests += 1
+        try:
+            for attempt in range(MAX_RETRIES):
+                try:
+                    stream, first = await self._first_response(prompt)
+                    break
+                except Exception as e:
+                    if not is_retryable(e) or attempt == MAX_RETRIES - 1:
+                        raise
+                    await asyncio.sleep(BASE_DELAY_S * (2 ** attempt) + random.uniform(0, 1))
+            try:
+                chunk = first
+                while chunk is not None:
+                    out.put(chunk.text or "")
+                    chunk = await anext(stream, None)
+            finally:
+                await stream.aclose()
+            out.put(_DONE)
+        except Exception as e:
+            out.put(e)
+
+    def stream(self, prompt):
+        """
+        Yields the response text for `prompt` chunk by chunk, from the calling thread.
+        Stopping early cancels the request.
+        """
+        out = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(self._stream(prompt, out), self._loop)
+        try:
+            while True:
+                item = out.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            future.cancel()
+
+@st.cache_resource
+def get_gemini_client():
+    """The shared AsyncGeminiClient, or None without a GEMINI_API_KEY."""
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        return None
+    try:
+        return AsyncGeminiClient(api_key)
+    except Exception as e:
+        print(f"Error initializing Gemini client: {e}")
+        return None
@@ -0,0 +1,130 @@
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+# Local stand-in for the Gemini streaming endpoint, so the Copilot client's tail latency can be
+# measured offline. Serve it with `python -m src.gemini_stub` and start the app with
+# GEMINI_BASE_URL=http://127.0.0.1:8765 (any GEMINI_API_KEY), or compare hedged and unhedged
+# requests with `python -m src.gemini_stub --bench 300`.
+
+STUB_ANSWER = ["Here is the code:\n", "```python\n", "result = df.shape[0]\n", "```\n", "This counts the rows."]
+
+class StubConfig:
+    """Latency model: a log-normal first-token delay, an occasional stall and occasional 503s."""
+    def __init__(self, median_ms=300, sigma=0.3, tail_p=0.05, tail_ms=3000, error_p=0.0, chunk_ms=20):
+        self.median_ms = median_ms
+        self.sigma = sigma
+        self.tail_p = tail_p
+        self.tail_ms = tail_ms
+        self.error_p = error_p
+        self.chunk_ms = chunk_ms
+
+    def first_token_delay(self) -> float:
+        delay = self.median_ms * random.lognormvariate(0, self.sigma)
+        if random.random() < self.tail_p:
+            delay += self.tail_ms
+        return delay / 1000
+
+def make_handler(config):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so client connection reuse is measured too
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            try:
+                self._reply()
+            except (BrokenPipeError, ConnectionResetError):
+                self.close_connection = True  # the client cancelled, e.g. a hedge that lost
+
+        def _reply(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            time.sleep(config.first_token_delay())
+            if random.random() < config.error_p:
+                body = json.dumps({"error": {"code": 503, "message": "The stub is overloaded.", "status": "UNAVAILABLE"}}).encode()
+                self.send_response(503)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+            chunks = []
+            for i, text in enumerate(STUB_ANSWER):
+                event = {"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}]}
+                if i == len(STUB_ANSWER) - 1:
+                    event["candidates"][0]["finishReason"] = "STOP"
+                chunks.append(f"data: {json.dumps(event)}\r\n\r\n".encode())
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Content-Length", str(sum(len(c) for c in chunks)))
+            self.end_headers()
+            for i, chunk in enumerate(chunks):
+                if i:
+                    time.sleep(config.chunk_ms / 1000)
+                self.wfile.write(chunk)
+                self.wfile.flush()
+    return StubHandler
+
+def start_stub(config=None, host="127.0.0.1", port=8765) -> ThreadingHTTPServer:
+    """Serves the stub on a background thread; returns the server (server_address has the port)."""
+    server = ThreadingHTTPServer((host, port), make_handler(config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def benchmark(base_url, requests=300, concurrency=8, hedge=True):
+    """First-token and total latency percentiles (ms) of `requests` streamed answers."""
+    from src.gemini_client import AsyncGeminiClient
+
+    client = AsyncGeminiClient("stub-key", base_url=base_url, hedge=hedge)
+
+    def one(_):
+        start = time.perf_counter()
+        first = None
+        for _text in client.stream("How many rows?"):
+            if first is None:
+                first = time.perf_counter() - start
+        return first, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        timings = np.array(list(pool.map(one, range(requests)))) * 1000
+    row = {"hedge": hedge}
+    for name, column in (("first", 0), ("total", 1)):
+        for p in (50, 95, 99):
+            row[f"{name}_p{p}"] = round(float(np.percentile(timings[:, column], p)))
+    row.update(client.stats())
+    return row
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local Gemini stub for offline Copilot latency tests.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--median-ms", type=float, default=300)
+    parser.add_argument("--tail-p", type=float, default=0.05)
+    parser.add_argument("--tail-ms", type=float, default=3000)
+    parser.add_argument("--error-p", type=float, default=0.0)
+    parser.add_argument("--bench", type=int, metavar="REQUESTS", help="benchmark the client instead of serving")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    config = StubConfig(median_ms=args.median_ms, tail_p=args.tail_p, tail_ms=args.tail_ms, error_p=args.error_p)
+    server = start_stub(config, port=0 if args.bench else args.port)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    if args.bench:
+        for hedge in (False, True):
+            print(benchmark(base_url, args.bench, args.concurrency, hedge))
+        return
+    print(f"Gemini stub listening on {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    sys.exit(main())
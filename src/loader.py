@@ -1,21 +1,131 @@
+import os
 import pandas as pd
 import streamlit as st
+from dotenv import load_dotenv
+from src.cache import cache_key, read_snapshot, write_snapshot
+from src.analysis import apply_column_types
 
-@st.cache_data
-def load_data(file) -> pd.DataFrame:
+load_dotenv()
+
+# Upper bound (MB) on the in-memory size of a parsed upload. Override with LOAD_MEMORY_BUDGET_MB in .env
+MEMORY_BUDGET_MB = int(os.getenv("LOAD_MEMORY_BUDGET_MB", "1024"))
+# Rows parsed per chunk when streaming a CSV
+CSV_CHUNK_ROWS = 200_000
+
+# String columns with at most this share of distinct values are stored as `category`
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+def compact_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Shrinks a freshly loaded frame without changing any value: low-cardinality string
+    columns become `category`. Numeric columns keep their 64-bit types, since arithmetic
+    on narrowed types overflows or loses precision in every consumer (dashboard, scan,
+    Copilot code).
+    Memory before/after (bytes) is recorded in df.attrs['memory'] for the UI.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    compacted = {}
+
+    for col in df.columns:
+        series = df[col]
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_numeric_dtype(series):
+            continue
+        if pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series):
+            if len(series) and series.nunique() <= CATEGORY_MAX_UNIQUE_RATIO * len(series):
+                compacted[col] = series.astype('category')
+
+    if compacted:
+        df = df.assign(**compacted)
+    df.attrs['memory'] = {"before": before, "after": int(df.memory_usage(deep=True).sum())}
+    return df
+
+def memory_summary(df: pd.DataFrame) -> str:
+    """Human readable in-memory size of a loaded frame, with the saving from compaction."""
+    report = df.attrs.get('memory') or {}
+    after = report.get("after", int(df.memory_usage(deep=True).sum()))
+    if after >= 1024 ** 2:
+        summary = f"{after / 1024 ** 2:,.1f} MB in memory"
+    else:
+        summary = f"{after / 1024:,.1f} KB in memory"
+    before = report.get("before")
+    if before and before > after:
+        summary += f" (saved {1 - after / before:.0%})"
+    return summary
+
+def _file_size(file):
+    """Returns the size of a file-like object in bytes without consuming it."""
+    size = getattr(file, "size", None)
+    if size is None:
+        pos = file.tell()
+        size = file.seek(0, os.SEEK_END)
+        file.seek(pos)
+    return size
+
+def read_csv_streaming(file, memory_budget_mb=MEMORY_BUDGET_MB, chunk_rows=CSV_CHUNK_ROWS, progress_callback=None) -> pd.DataFrame:
+    """
+    Reads a CSV in bounded chunks instead of parsing the whole upload at once.
+    Empty rows are dropped per chunk and the parsed size is tracked as chunks arrive,
+    so a file that would not fit in `memory_budget_mb` is rejected early with a MemoryError.
+    The budget covers the peak while the chunks are concatenated: twice the parsed size.
+    `progress_callback(fraction, rows_read)` is called after every chunk.
+    """
+    budget_bytes = memory_budget_mb * 1024 * 1024
+    total_size = _file_size(file)
+    chunks = []
+    used_bytes = 0
+    rows_read = 0
+
+    for chunk in pd.read_csv(file, chunksize=chunk_rows):
+        chunk = chunk.dropna(how='all')
+        used_bytes += chunk.memory_usage(deep=True).sum()
+        # Empty chunks would upcast column dtypes on concat; keep one only to carry the header
+        if not chunk.empty or not chunks:
+            chunks.append(chunk)
+        # Joining several chunks briefly holds them and the concatenated copy together
+        peak_bytes = used_bytes if sum(not c.empty for c in chunks) <= 1 else 2 * used_bytes
+        if peak_bytes > budget_bytes:
+            raise MemoryError(
+                f"Dataset exceeds the {memory_budget_mb} MB memory budget "
+                f"(stopped after {rows_read:,} rows)."
+            )
+        rows_read += len(chunk)
+
+        if progress_callback and total_size:
+            progress_callback(min(file.tell() / total_size, 1.0), rows_read)
+
+    if progress_callback:
+        progress_callback(1.0, rows_read)
+
+    chunks = [c for c in chunks if not c.empty] or chunks[:1]
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks)
+
+def load_data(file, progress_callback=None, key=None) -> pd.DataFrame:
     """
     Loads data from a CSV or Excel file into a Pandas DataFrame.
+    Parsed frames get their date columns typed (see apply_column_types), are compacted
+    (see compact_dtypes) and are cached on disk as Parquet,
+    keyed by the upload's content hash, so re-uploading the same file (from any session, across restarts) skips parsing.
+    CSVs are streamed in chunks under MEMORY_BUDGET_MB; `progress_callback`
+    receives (fraction, rows_read) updates. Pass `key` when the caller already
+    computed cache_key(file) to avoid hashing the upload twice.
     """
     try:
         if file.name.endswith('.csv'):
-            df = pd.read_csv(file)
+            parse = lambda: read_csv_streaming(file, progress_callback=progress_callback)
         elif file.name.endswith('.xlsx'):
-            df = pd.read_excel(file)
+            # Simple preprocessing: drop empty rows (CSVs do this per chunk)
+            parse = lambda: pd.read_excel(file).dropna(how='all')
         else:
             return None
-        
-        # Simple preprocessing: drop empty rows
-        df = df.dropna(how='all')
+
+        key = key or cache_key(file)
+        df = read_snapshot(key)
+        if df is None:
+            # Dates are typed before compaction so date strings never become categories
+            df = compact_dtypes(apply_column_types(parse()))
+            write_snapshot(key, df)
         return df
     except Exception as e:
         st.error(f"Error loading file: {e}")
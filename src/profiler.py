@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# Most frequent values kept per categorical column
+TOP_VALUES = 10
+
+QUANTILES = {"25%": 0.25, "50%": 0.5, "75%": 0.75}
+
+def _sorted_quantiles(sorted_values):
+    """Linear-interpolated quantiles (same as pandas) read from an already sorted array."""
+    m = len(sorted_values)
+    result = {}
+    for label, q in QUANTILES.items():
+        pos = q * (m - 1)
+        lo = int(np.floor(pos))
+        hi = min(lo + 1, m - 1)
+        result[label] = float(sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo))
+    return result
+
+class ColumnProfile:
+    """
+    Per-column statistics for a whole dataset: counts, nulls, cardinality, min/max,
+    mean/std, quartiles and the most frequent categories.
+    Each column is scanned once; numeric columns are sorted a single time, which yields
+    min/max, quantiles and cardinality together.
+    Build it through get_column_profile so it is computed once per dataset fingerprint.
+    """
+    def __init__(self, df: pd.DataFrame):
+        self.rows = len(df)
+        self.top_values = {}
+        records = {}
+        for col in df.columns:
+            records[col] = self._profile_column(col, df[col])
+        self.stats = pd.DataFrame.from_dict(records, orient='index')
+
+    def _profile_column(self, col, series):
+        dtype = series.dtype
+        record = {"dtype": str(dtype), "kind": "text", "count": 0, "nulls": 0, "unique": 0,
+                  "min": None, "max": None, "mean": np.nan, "std": np.nan,
+                  "25%": np.nan, "50%": np.nan, "75%": np.nan}
+
+        if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            values = np.sort(series.to_numpy(dtype='float64', na_value=np.nan))  # NaNs sort last
+            count = len(values) - int(np.isnan(values).sum())
+            valid = values[:count]
+            record.update(kind="numeric", count=count, nulls=len(values) - count)
+            if count:
+                record.update(
+                    unique=int(np.count_nonzero(np.diff(valid))) + 1,
+                    min=float(valid[0]), max=float(valid[-1]),
+                    mean=float(valid.mean()),
+                    std=float(valid.std(ddof=1)) if count > 1 else np.nan,
+                    **_sorted_quantiles(valid),
+                )
+        elif isinstance(dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy()
+            observed = codes[codes >= 0]
+            counts = np.bincount(observed, minlength=len(dtype.categories))
+            record.update(kind="category", count=len(observed), nulls=len(codes) - len(observed),
+                          unique=int(np.count_nonzero(counts)))
+            top = np.argsort(counts)[::-1][:TOP_VALUES]
+            top = top[counts[top] > 0]
+            self.top_values[col] = pd.Series(counts[top], index=dtype.categories[top])
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            valid = series.dropna()
+            record.update(kind="datetime", count=len(valid), nulls=len(series) - len(valid), unique=valid.nunique())
+            if len(valid):
+                record.update(min=valid.min(), max=valid.max())
+        else:
+            counts = series.value_counts(dropna=True)
+            count = int(counts.sum())
+            record.update(count=count, nulls=len(series) - count, unique=len(counts))
+            self.top_values[col] = counts.head(TOP_VALUES)
+        return record
+
+    def nunique(self, col) -> int:
+        return int(self.stats.at[col, "unique"])
+
+    def missing(self) -> pd.Series:
+        """Null count per column, like df.isnull().sum()."""
+        return self.stats["nulls"].astype(int)
+
+    def describe(self) -> pd.DataFrame:
+        """Numeric summary laid out like df.describe()."""
+        numeric = self.stats[self.stats["kind"] == "numeric"]
+        summary = numeric[["count", "mean", "std", "min", "25%", "50%", "75%", "max"]].astype(float)
+        return summary.T
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def get_column_profile(dataset_key, _df) -> ColumnProfile:
+    """Returns the ColumnProfile for a dataset, computed once per content fingerprint."""
+    return ColumnProfile(_df)
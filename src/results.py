@@ -0,0 +1,93 @@
+import io
+import os
+import uuid
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+from src.lru import ByteLRU
+
+load_dotenv()
+
+# Full Copilot result tables are evicted (least recently used first) past this much memory
+RESULT_STORE_MAX_MB = int(os.getenv("COPILOT_RESULT_STORE_MB", "256"))
+# Rows and columns of a result kept in the chat history itself
+RESULT_PREVIEW_ROWS = 10
+RESULT_PREVIEW_COLS = 20
+RESULT_PAGE_ROWS = 100
+
+def as_frame(result) -> pd.DataFrame:
+    """
+    A DataFrame or Series result as a flat table: a meaningful index (named, like the groups
+    of a groupby, or non-integer) becomes columns, and column names become strings.
+    """
+    frame = result.to_frame(name=result.name if result.name is not None else "value") if isinstance(result, pd.Series) else result
+    if any(name is not None for name in frame.index.names) or not pd.api.types.is_integer_dtype(frame.index.dtype):
+        try:
+            frame = frame.reset_index()
+        except ValueError:
+            # An index level shares a column's name
+            frame = frame.rename_axis([f"{name or 'index'} (index)" for name in frame.index.names]).reset_index()
+    if isinstance(frame.columns, pd.MultiIndex) or any(not isinstance(c, str) for c in frame.columns):
+        frame = frame.copy(deep=False)
+        frame.columns = [" / ".join(map(str, c)) if isinstance(c, tuple) else str(c) for c in frame.columns]
+    return frame
+
+def table_summary(frame: pd.DataFrame, result_id) -> dict:
+    """
+    Bounded description of a table result for the chat history: shape, dtypes and the first
+    RESULT_PREVIEW_ROWS rows of at most RESULT_PREVIEW_COLS columns.
+    """
+    return {
+        "kind": "table",
+        "result_id": result_id,
+        "shape": frame.shape,
+        "dtypes": {str(col): str(dtype) for col, dtype in frame.dtypes.iloc[:RESULT_PREVIEW_COLS].items()},
+        "preview": frame.iloc[:RESULT_PREVIEW_ROWS, :RESULT_PREVIEW_COLS].copy(),
+    }
+
+def _frame_nbytes(frame) -> int:
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+class ResultStore:
+    """
+    Process-wide, thread-safe store of full Copilot result tables, so chat history only
+    keeps a preview and an id. Pages and downloads are read from here on demand. Bounded
+    by memory (least recently used dropped first); an evicted result has to be asked for
+    again, and one larger than the whole budget is not stored.
+    """
+    def __init__(self, max_mb=RESULT_STORE_MAX_MB):
+        self._frames = ByteLRU(max_mb * 1024 * 1024, _frame_nbytes)
+
+    def put(self, frame: pd.DataFrame):
+        """Stores `frame` and returns its id, or None if it is over the store's budget."""
+        result_id = uuid.uuid4().hex
+        return result_id if self._frames.put(result_id, frame) else None
+
+    def get(self, result_id):
+        return self._frames.get(result_id)
+
+    def page(self, result_id, page, page_rows=RESULT_PAGE_ROWS):
+        """Rows of page `page` (from 0) of a stored result, or None if it was evicted."""
+        frame = self.get(result_id)
+        if frame is None:
+            return None
+        return frame.iloc[page * page_rows:(page + 1) * page_rows]
+
+    def to_csv(self, result_id) -> bytes:
+        frame = self.get(result_id)
+        return b"" if frame is None else frame.to_csv(index=False).encode("utf-8")
+
+    def to_parquet(self, result_id) -> bytes:
+        frame = self.get(result_id)
+        if frame is None:
+            return b""
+        buffer = io.BytesIO()
+        frame.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+
+    def stats(self) -> dict:
+        return self._frames.stats()
+
+@st.cache_resource
+def get_result_store() -> ResultStore:
+    return ResultStore()
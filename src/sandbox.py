@@ -0,0 +1,167 @@
+import os
+import time
+import pickle
+import queue
+import threading
+import multiprocessing
+import psutil
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import streamlit as st
+from dotenv import load_dotenv
+from src.cache import CACHE_MAX_MB, prune_snapshots
+from src.sandbox_worker import worker_main
+
+load_dotenv()
+
+# Pre-started worker processes that run Copilot-generated code
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "2"))
+# A query is killed once it runs longer than this...
+SANDBOX_TIMEOUT_S = float(os.getenv("SANDBOX_TIMEOUT_S", "30"))
+# ...or once its worker's private memory passes this
+SANDBOX_MAX_RSS_MB = int(os.getenv("SANDBOX_MAX_RSS_MB", "2048"))
+# Table results are cut to this many rows in the worker...
+SANDBOX_RESULT_ROWS = int(os.getenv("SANDBOX_RESULT_ROWS", "100000"))
+# ...and any result larger than this is refused there, so it never reaches the server
+SANDBOX_RESULT_MAX_MB = int(os.getenv("SANDBOX_RESULT_MAX_MB", "64"))
+# Datasets are shared with the workers as memory-mapped Arrow files here
+SANDBOX_DIR = os.getenv("SANDBOX_DIR", os.path.join(os.getcwd(), ".cache", "sandbox"))
+
+POLL_INTERVAL_S = 0.05
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ps = psutil.Process(self.process.pid)
+
+    def private_memory(self) -> int:
+        """Resident memory not shared with other processes (e.g. the memory-mapped dataset)."""
+        mem = self.ps.memory_info()
+        return mem.rss - getattr(mem, "shared", 0)
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+class SandboxPool:
+    """
+    Pool of pre-started worker processes that run Copilot-generated pandas code away from
+    the Streamlit server. Each dataset is written once as an Arrow file that the workers
+    memory-map, so it is not copied per query. Every query runs under a wall-clock timeout
+    and a memory cap; a worker that exceeds either is killed, reported to the caller and
+    replaced in the background without affecting other sessions. Results are capped in the
+    worker to `result_rows` rows and `result_max_mb` before they are sent back.
+    """
+    def __init__(self, workers=SANDBOX_WORKERS, timeout=SANDBOX_TIMEOUT_S, max_rss_mb=SANDBOX_MAX_RSS_MB,
+                 result_rows=SANDBOX_RESULT_ROWS, result_max_mb=SANDBOX_RESULT_MAX_MB):
+        self.timeout = timeout
+        self.max_rss = max_rss_mb * 1024 * 1024
+        self.result_rows = result_rows
+        self.result_max_bytes = result_max_mb * 1024 * 1024
+        self._ctx = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._snapshots = {}  # dataset key -> path
+        self._writing = {}  # dataset key -> Event set once its file is written
+        for _ in range(workers):
+            self._idle.put(_Worker(self._ctx))
+
+    def _snapshot(self, key, df) -> str:
+        """
+        Path of the dataset's file for the workers, writing it on first use.
+        The write happens outside the pool lock, so queries on other datasets are not held up;
+        concurrent callers for the same key wait for the one writer.
+        """
+        while True:
+            with self._lock:
+                path = self._snapshots.get(key)
+                if path is not None and os.path.exists(path):
+                    return path
+                writing = self._writing.get(key)
+                if writing is None:
+                    writing = self._writing[key] = threading.Event()
+                    break
+            writing.wait()  # another session is writing it; then re-check
+
+        try:
+            path = self._write_snapshot(key, df)
+            with self._lock:
+                self._snapshots[key] = path
+        finally:
+            with self._lock:
+                del self._writing[key]
+            writing.set()
+        prune_snapshots(CACHE_MAX_MB, SANDBOX_DIR, ('.arrow', '.pkl'))
+        return path
+
+    def _write_snapshot(self, key, df) -> str:
+        os.makedirs(SANDBOX_DIR, exist_ok=True)
+        path = os.path.join(SANDBOX_DIR, f"{key}.arrow")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(tmp_path, "wb") as sink, ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        except Exception as e:
+            # Columns Arrow cannot represent (e.g. mixed-type objects) fall back to a pickle
+            print(f"Sharing dataset with sandbox as pickle: {e}")
+            path = os.path.join(SANDBOX_DIR, f"{key}.pkl")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return path
+
+    def _replace(self, worker):
+        worker.kill()
+        threading.Thread(target=lambda: self._idle.put(_Worker(self._ctx)), daemon=True).start()
+
+    def run(self, key, df, code) -> dict:
+        """
+        Runs `code` with `df` bound to the dataset in a worker.
+        Returns {"ok": True, "result": ...} or {"ok": False, "error": message}; a table cut to
+        `result_rows` also has its full length under "rows".
+        """
+        try:
+            path = self._snapshot(key, df)
+        except Exception as e:
+            return {"ok": False, "error": f"The dataset could not be shared with the analysis workers: {e}"}
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            return {"ok": False, "error": "All analysis workers are busy. Please try again in a moment."}
+
+        try:
+            worker.conn.send({"key": key, "path": path, "code": code,
+                              "max_rows": self.result_rows, "max_bytes": self.result_max_bytes})
+            start = time.monotonic()
+            while not worker.conn.poll(POLL_INTERVAL_S):
+                if not worker.process.is_alive():
+                    self._replace(worker)
+                    return {"ok": False, "error": "The analysis worker crashed while running this query."}
+                if time.monotonic() - start > self.timeout:
+                    self._replace(worker)
+                    return {"ok": False, "error": f"The query was stopped after the {self.timeout:.0f}s time limit."}
+                try:
+                    over_memory = worker.private_memory() > self.max_rss
+                except psutil.Error:
+                    over_memory = False
+                if over_memory:
+                    self._replace(worker)
+                    return {"ok": False, "error": f"The query was stopped for using more than {self.max_rss // (1024 * 1024)} MB of memory."}
+            reply = worker.conn.recv()
+        except EOFError:
+            self._replace(worker)
+            return {"ok": False, "error": "The analysis worker crashed while running this query."}
+        except Exception as e:
+            self._replace(worker)
+            return {"ok": False, "error": f"The analysis worker failed: {e}"}
+        self._idle.put(worker)
+        return reply
+
+@st.cache_resource
+def get_sandbox_pool() -> SandboxPool:
+    return SandboxPool()
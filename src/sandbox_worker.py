@@ -0,0 +1,62 @@
+import pickle
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+def load_dataset(path) -> pd.DataFrame:
+    """
+    Opens a dataset snapshot written by SandboxPool. Arrow files are memory-mapped, so
+    numeric columns without missing values are used in place rather than copied.
+    """
+    if path.endswith(".arrow"):
+        table = ipc.open_file(pa.memory_map(path)).read_all()
+        return table.to_pandas(split_blocks=True)
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+def cap_result(result, max_rows) -> dict:
+    """Reply for a result; a table longer than `max_rows` is cut, with its full length under "rows"."""
+    if isinstance(result, (pd.DataFrame, pd.Series)) and len(result) > max_rows:
+        return {"ok": True, "result": result.iloc[:max_rows], "rows": len(result)}
+    return {"ok": True, "result": result}
+
+def encode_reply(reply, max_bytes) -> bytes:
+    """Pickled reply, or a pickled error if the result cannot be sent or is over `max_bytes`."""
+    try:
+        payload = pickle.dumps(reply, protocol=pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        return pickle.dumps({"ok": False, "error": f"The result could not be returned: {e}"})
+    if len(payload) > max_bytes:
+        mb = 1024 * 1024
+        return pickle.dumps({"ok": False, "error": f"The result is {len(payload) / mb:,.0f} MB, over the "
+                             f"{max_bytes / mb:,.0f} MB limit. Ask for a summary or fewer rows instead."})
+    return payload
+
+def worker_main(conn):
+    """
+    Entry point of a sandbox worker process. Receives jobs ({"key", "path", "code",
+    "max_rows", "max_bytes"}) over `conn` and replies {"ok": True, "result": ...} or
+    {"ok": False, "error": ...}. Results are capped here (see cap_result and encode_reply),
+    so a huge `result` never reaches the server process.
+    The most recently used dataset stays loaded between jobs.
+    """
+    datasets = {}
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        try:
+            if job["key"] not in datasets:
+                datasets.clear()
+                datasets[job["key"]] = load_dataset(job["path"])
+            # Shallow copy: generated code may add or drop columns without touching the cached frame
+            local_scope = {"df": datasets[job["key"]].copy(deep=False), "pd": pd, "result": None}
+            exec(job["code"], {}, local_scope)
+            reply = cap_result(local_scope.get("result"), job["max_rows"])
+        except BaseException as e:
+            reply = {"ok": False, "error": str(e) or type(e).__name__}
+        # Sent pre-pickled; Connection.recv unpickles it on the other side
+        conn.send_bytes(encode_reply(reply, job["max_bytes"]))
@@ -0,0 +1,186 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import streamlit as st
+from src.analysis import box_stats
+
+# Columns checked for outliers (the summary uses the first 5, Key Insights lists the first 3)
+OUTLIER_COLUMNS = 5
+STRONG_CORRELATION = 0.7
+# Finished scans kept in memory, least recently used dropped first
+MAX_CACHED_SCANS = 32
+
+class ScanCancelled(Exception):
+    pass
+
+class ScanResult:
+    """
+    Everything the Auto Exploration page renders after an Advanced Scan.
+    Computed once per dataset by run_scan; the page only formats these fields.
+    """
+    def __init__(self):
+        self.rows = 0
+        self.columns = 0
+        self.numeric_cols = []
+        self.date_col = None
+        self.date_min = None
+        self.date_max = None
+        self.outliers = {}       # column -> {"count", "lower", "upper", "min", "max"}
+        self.corr = None         # signed Pearson correlation matrix
+        self.strong_pairs = []   # (col1, col2, |r|) above STRONG_CORRELATION
+        self.top_pair = None     # (col1, col2) with the highest |r|, if strong
+        self.distribution_col = None
+        self.distribution = None  # box_stats of distribution_col
+
+    def summary_points(self):
+        points = [f"The dataset consists of **{self.rows} rows** and **{self.columns} columns**."]
+        if self.date_col is not None:
+            points.append(f"It covers a time range from **{self.date_min.strftime('%Y-%m-%d')}** "
+                          f"to **{self.date_max.strftime('%Y-%m-%d')}**.")
+        outlier_cols = [col for col, info in self.outliers.items() if info["count"] > 0]
+        if outlier_cols:
+            points.append(f"Potential outliers were detected in **{', '.join(outlier_cols[:3])}**.")
+        if self.top_pair is not None:
+            points.append(f"A strong relationship exists between **{self.top_pair[0]}** and **{self.top_pair[1]}**.")
+        return points
+
+def run_scan(df, profile, progress_callback=None, cancel_event=None) -> ScanResult:
+    """
+    Runs the Advanced Scan: IQR outliers, correlations, time range and the most spread-out column.
+    Quartiles, std and date bounds come from the dataset's ColumnProfile.
+    Raises ScanCancelled if `cancel_event` is set between steps.
+    """
+    def step(fraction):
+        if cancel_event is not None and cancel_event.is_set():
+            raise ScanCancelled()
+        if progress_callback:
+            progress_callback(fraction)
+
+    result = ScanResult()
+    result.rows, result.columns = df.shape
+    num_df = df.select_dtypes(include=[np.number])
+    result.numeric_cols = list(num_df.columns)
+    stats = profile.stats
+
+    date_cols = df.select_dtypes(include=['datetime', 'datetimetz']).columns
+    if len(date_cols) > 0 and pd.notnull(stats.at[date_cols[0], "min"]):
+        result.date_col = date_cols[0]
+        result.date_min = stats.at[result.date_col, "min"]
+        result.date_max = stats.at[result.date_col, "max"]
+    step(0.1)
+
+    # A. Outliers (IQR)
+    outlier_cols = result.numeric_cols[:OUTLIER_COLUMNS]
+    for i, col in enumerate(outlier_cols):
+        q1, q3 = stats.at[col, "25%"], stats.at[col, "75%"]
+        iqr = q3 - q1
+        lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        values = num_df[col].to_numpy()
+        result.outliers[col] = {
+            "count": int(np.count_nonzero((values < lower) | (values > upper))),
+            "lower": lower, "upper": upper,
+            "min": stats.at[col, "min"], "max": stats.at[col, "max"],
+        }
+        step(0.1 + 0.4 * (i + 1) / len(outlier_cols))
+
+    # B. Correlations (computed once, reused by the heatmap and the insights)
+    if len(result.numeric_cols) > 1:
+        result.corr = num_df.corr()
+        abs_corr = result.corr.abs().to_numpy()
+        cols = result.corr.columns
+        n = len(cols)
+        result.strong_pairs = [(cols[j], cols[i], abs_corr[i, j])
+                               for i in range(n) for j in range(i + 1, n)
+                               if abs_corr[i, j] > STRONG_CORRELATION]
+        upper = np.where(np.triu(np.ones((n, n), dtype=bool), k=1), abs_corr, np.nan)
+        if np.nanmax(upper) > STRONG_CORRELATION:
+            i, j = np.unravel_index(np.nanargmax(upper), upper.shape)
+            result.top_pair = (cols[i], cols[j])
+    step(0.9)
+
+    # C. Distribution: the column with the highest standard deviation
+    if result.numeric_cols:
+        result.distribution_col = stats.loc[result.numeric_cols, "std"].astype(float).idxmax()
+        result.distribution = box_stats(num_df[result.distribution_col].to_numpy(dtype='float64', na_value=np.nan))
+    step(1.0)
+    return result
+
+class ScanJob:
+    """
+    An Advanced Scan running on a worker thread, with progress and cancellation.
+    Sessions that wait on the job subscribe to it; a cancel only unsubscribes the session
+    that asked, and the scan stops once no session is waiting on it.
+    """
+    def __init__(self, df, profile):
+        self.progress = 0.0
+        self.status = "running"  # running | done | cancelled | failed
+        self.result = None
+        self.error = None
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+        self._waiting = set()  # ids of sessions waiting on the scan
+        self._thread = threading.Thread(target=self._run, args=(df, profile), daemon=True)
+        self._thread.start()
+
+    def _run(self, df, profile):
+        try:
+            self.result = run_scan(df, profile, self._set_progress, self._cancel)
+            self.status = "done"
+        except ScanCancelled:
+            self.status = "cancelled"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "failed"
+
+    def _set_progress(self, fraction):
+        self.progress = fraction
+
+    def subscribe(self, session_id):
+        with self._lock:
+            self._waiting.add(session_id)
+
+    def cancel(self, session_id=None):
+        """Stops waiting on behalf of `session_id`, and stops the scan if nobody else waits."""
+        with self._lock:
+            self._waiting.discard(session_id)
+            if not self._waiting:
+                self._cancel.set()
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+class ScanRegistry:
+    """Process-wide scan jobs memoized by dataset fingerprint."""
+    def __init__(self, max_entries=MAX_CACHED_SCANS):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None:
+                self._jobs.move_to_end(key)
+            return job
+
+    def start(self, key, df, profile, session_id=None) -> ScanJob:
+        """
+        Returns the running or finished scan for `key`, starting one if needed, with
+        `session_id` subscribed to it.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job.status in ("cancelled", "failed") or job.cancel_requested:
+                job = ScanJob(df, profile)
+                self._jobs[key] = job
+            job.subscribe(session_id)
+            self._jobs.move_to_end(key)
+            while len(self._jobs) > self.max_entries:
+                self._jobs.popitem(last=False)
+            return job
+
+@st.cache_resource
+def get_scan_registry() -> ScanRegistry:
+    return ScanRegistry()
@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+import streamlit as st
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Unreferenced datasets are evicted (least recently used first) once resident data passes this size
+STORE_MAX_MB = int(os.getenv("DATASET_STORE_MAX_MB", "2048"))
+
+class DatasetHandle:
+    """
+    A session's reference to a dataset held in the shared DatasetStore.
+    Sessions keep the handle in st.session_state instead of their own DataFrame;
+    the reference is released when the session loads another dataset or is garbage collected.
+    """
+    def __init__(self, store, key, name):
+        self.store = store
+        self.key = key
+        self.name = name
+        self._released = False
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self.store.get(self.key)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.store.release(self.key)
+
+    def __del__(self):
+        try:
+            self.release()
+        except Exception:
+            pass
+
+class DatasetStore:
+    """
+    Process-wide, thread-safe registry of loaded datasets keyed by content fingerprint.
+    Every session that loads the same file shares one DataFrame, which must be treated as
+    read-only. Entries are reference counted; once the total size passes `max_mb`, entries
+    no session references any more are evicted in LRU order.
+    """
+    def __init__(self, max_mb=STORE_MAX_MB):
+        self.max_bytes = max_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> {"df", "refs", "nbytes"}
+
+    def acquire(self, key, name=None):
+        """Returns a new handle to a resident dataset, or None if `key` is not loaded."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry["refs"] += 1
+            self._entries.move_to_end(key)
+        return DatasetHandle(self, key, name)
+
+    def put(self, key, df: pd.DataFrame, name=None) -> DatasetHandle:
+        """
+        Registers `df` under `key` and returns a handle to it. If another session already
+        loaded the same content, the resident frame is shared and `df` is dropped.
+        """
+        report = df.attrs.get('memory') or {}
+        nbytes = report.get("after") or int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = {"df": df, "refs": 0, "nbytes": nbytes}
+                self._entries[key] = entry
+            entry["refs"] += 1
+            self._entries.move_to_end(key)
+            self._evict()
+        return DatasetHandle(self, key, name)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry["df"] if entry is not None else None
+
+    def release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["refs"] > 0:
+                entry["refs"] -= 1
+            self._evict()
+
+    def _evict(self):
+        # Caller holds the lock. Referenced entries are never evicted.
+        total = sum(e["nbytes"] for e in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry["refs"] == 0:
+                total -= entry["nbytes"]
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "datasets": len(self._entries),
+                "references": sum(e["refs"] for e in self._entries.values()),
+                "bytes": sum(e["nbytes"] for e in self._entries.values()),
+            }
+
+@st.cache_resource
+def get_dataset_store() -> DatasetStore:
+    return DatasetStore()
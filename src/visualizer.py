@@ -1,5 +1,199 @@
 import plotly.express as px
+import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
+import streamlit as st
+from src.aggregation import AggregationPlan
+
+# Approximate rendered widths, used to size downsampled traces
+GRID_CHART_WIDTH_PX = 420    # Dashboard 3-column grid
+HALF_CHART_WIDTH_PX = 640    # Auto Exploration side column
+FULL_CHART_WIDTH_PX = 1280   # Focused / enlarged views
+POINTS_PER_PIXEL = 2
+
+def target_points(width_px):
+    """Number of points worth sending for a line chart of the given width."""
+    return max(int(width_px * POINTS_PER_PIXEL), 100)
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: picks `n_out` indices of the sorted series (x, y) that
+    preserve its visual shape. The first and last points are always kept; every bucket in
+    between contributes the point forming the largest triangle with the previously kept
+    point and the average of the next bucket.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    xf = x.astype('int64').astype('float64') if x.dtype.kind == 'M' else x.astype('float64')
+    xf = xf - xf[0]
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i == n_out - 3:
+            avg_x, avg_y = xf[-1], y[-1]
+        else:
+            next_end = edges[i + 2]
+            avg_x, avg_y = xf[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((xf[a] - avg_x) * (y[start:end] - y[a]) - (xf[a] - xf[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    return indices
+
+def naive_values(series):
+    """
+    NumPy values of a column. Tz-aware dates (an object array of Timestamps otherwise)
+    become naive datetime64 wall-clock times, as in FilterIndex and DataCube.
+    """
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        series = series.dt.tz_localize(None)
+    return series.to_numpy()
+
+def sorted_series(df, x_col, y_col):
+    """Returns (x, y) as NumPy arrays sorted by x, with rows missing either value dropped."""
+    pair = df[[x_col, y_col]].dropna()
+    x = naive_values(pair[x_col])
+    y = pair[y_col].to_numpy(dtype='float64')
+    if len(x) > 1 and not pair[x_col].is_monotonic_increasing:
+        order = np.argsort(x, kind='stable')
+        x, y = x[order], y[order]
+    return x, y
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def get_sorted_series(dataset_key, _df, x_col, y_col):
+    """sorted_series for a whole shared dataset, sorted once per fingerprint and column pair."""
+    return sorted_series(_df, x_col, y_col)
+
+def trend_figure(x, y, x_col, y_col, width_px, window=None, title=None):
+    """
+    Line chart of a sorted series downsampled with LTTB to what `width_px` can show.
+    `window` = (start, end) restricts the series first, so a zoomed-in view is re-fetched
+    at full resolution for that range.
+    """
+    if window is not None and len(x):
+        lo, hi = window
+        if x.dtype.kind == 'M':
+            lo, hi = pd.Timestamp(lo).to_datetime64(), pd.Timestamp(hi).to_datetime64()
+        start, end = np.searchsorted(x, lo, side='left'), np.searchsorted(x, hi, side='right')
+        x, y = x[start:end], y[start:end]
+    keep = lttb_indices(x, y, target_points(width_px))
+    return px.line(pd.DataFrame({x_col: x[keep], y_col: y[keep]}), x=x_col, y=y_col, title=title)
+
+# Scatter rendering: SVG up to WEBGL_POINT_THRESHOLD, WebGL up to DENSITY_POINT_THRESHOLD,
+# then a server-side 2D-binned density heatmap with sparse (outlying) points overlaid
+WEBGL_POINT_THRESHOLD = 10_000
+DENSITY_POINT_THRESHOLD = 200_000
+DENSITY_BINS = 150
+SPARSE_BIN_MAX_COUNT = 2       # points in bins this empty are drawn individually
+MAX_SPARSE_POINTS = 5_000
+
+def _as_float(values):
+    return values.astype('int64').astype('float64') if values.dtype.kind == 'M' else values.astype('float64')
+
+def density_figure(x, y, x_col, y_col, title=None):
+    """
+    2D histogram of (x, y) computed with NumPy, drawn as a heatmap. Points that fall in
+    nearly empty bins are overlaid as WebGL markers so outliers stay visible.
+    Dates must be naive datetime64 (see naive_values); bin centres keep their unit.
+    """
+    xf, yf = _as_float(x), _as_float(y)
+    xedges = np.linspace(xf.min(), xf.max(), DENSITY_BINS + 1)
+    yedges = np.linspace(yf.min(), yf.max(), DENSITY_BINS + 1)
+    # Bin index per point, then one bincount for the whole grid (cheaper than histogram2d)
+    ix = np.clip(np.searchsorted(xedges, xf, side='right') - 1, 0, DENSITY_BINS - 1)
+    iy = np.clip(np.searchsorted(yedges, yf, side='right') - 1, 0, DENSITY_BINS - 1)
+    counts = np.bincount(ix * DENSITY_BINS + iy, minlength=DENSITY_BINS ** 2).reshape(DENSITY_BINS, DENSITY_BINS)
+    x_centers = (xedges[:-1] + xedges[1:]) / 2
+    y_centers = (yedges[:-1] + yedges[1:]) / 2
+    if x.dtype.kind == 'M':
+        x_centers = x_centers.astype('int64').astype(x.dtype)
+    if y.dtype.kind == 'M':
+        y_centers = y_centers.astype('int64').astype(y.dtype)
+
+    fig = go.Figure(go.Heatmap(
+        x=x_centers, y=y_centers, z=np.where(counts > 0, counts, np.nan).T,
+        colorscale='Blues', colorbar=dict(title="Count"), hoverongaps=False,
+    ))
+
+    point_density = counts[ix, iy]
+    sparse = np.flatnonzero(point_density <= SPARSE_BIN_MAX_COUNT)
+    if len(sparse) > MAX_SPARSE_POINTS:
+        sparse = sparse[np.argsort(point_density[sparse], kind='stable')[:MAX_SPARSE_POINTS]]
+    if len(sparse):
+        fig.add_trace(go.Scattergl(x=x[sparse], y=y[sparse], mode='markers', name='Sparse points',
+                                   marker=dict(size=4, color='#ef4444'), showlegend=False))
+    fig.update_layout(title=title, xaxis_title=x_col, yaxis_title=y_col)
+    return fig
+
+def scatter_figure(df, x_col, y_col, color=None, title=None):
+    """
+    Scatter plot whose rendering path depends on size: SVG for small frames, WebGL
+    (Scattergl) past WEBGL_POINT_THRESHOLD, and a density heatmap past
+    DENSITY_POINT_THRESHOLD when both axes are numeric or dates. A heatmap cannot show
+    `color`, so a coloured scatter that large is drawn in WebGL from a uniform random
+    sample of DENSITY_POINT_THRESHOLD rows instead, noted in the title.
+    """
+    n = len(df)
+    if n <= WEBGL_POINT_THRESHOLD:
+        return px.scatter(df, x=x_col, y=y_col, color=color, title=title)
+
+    binnable = all(pd.api.types.is_numeric_dtype(df[c]) or pd.api.types.is_datetime64_any_dtype(df[c])
+                   for c in (x_col, y_col))
+    if n <= DENSITY_POINT_THRESHOLD or not binnable:
+        return px.scatter(df, x=x_col, y=y_col, color=color, title=title, render_mode='webgl')
+
+    if color is not None:
+        sample = df.sample(n=DENSITY_POINT_THRESHOLD, random_state=0)
+        note = f"random sample of {DENSITY_POINT_THRESHOLD:,} of {n:,} points"
+        return px.scatter(sample, x=x_col, y=y_col, color=color, render_mode='webgl',
+                          title=f"{title} ({note})" if title else note.capitalize())
+
+    pair = df[[x_col, y_col]].dropna()
+    return density_figure(naive_values(pair[x_col]), naive_values(pair[y_col]), x_col, y_col, title=title)
+
+# Upper bound on histogram bins; NumPy's 'auto' rule picks fewer for small samples
+MAX_HISTOGRAM_BINS = 100
+
+def histogram_figure(values, col, title=None):
+    """
+    Histogram binned server-side with NumPy: the figure carries bin edges and counts
+    instead of the raw column, so its size does not grow with the row count.
+    """
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return go.Figure().update_layout(title=title)
+    edges = np.histogram_bin_edges(values, bins='auto')
+    if len(edges) - 1 > MAX_HISTOGRAM_BINS:
+        edges = np.histogram_bin_edges(values, bins=MAX_HISTOGRAM_BINS)
+    counts, edges = np.histogram(values, bins=edges)
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+                           marker_color='#636efa', hovertemplate=f"{col}: %{{x}}<br>count: %{{y}}<extra></extra>"))
+    fig.update_layout(title=title, bargap=0, xaxis_title=col, yaxis_title="count")
+    return fig
+
+def box_figure(stats, col, title=None):
+    """
+    Box plot drawn from precomputed box_stats (quartiles, whiskers, mean) plus only the
+    outlier points, instead of shipping the whole column for Plotly to summarise.
+    """
+    fig = go.Figure()
+    if stats is None:
+        return fig.update_layout(title=title)
+    fig.add_trace(go.Box(
+        name=col, q1=[stats["q1"]], median=[stats["median"]], q3=[stats["q3"]],
+        lowerfence=[stats["lowerfence"]], upperfence=[stats["upperfence"]], mean=[stats["mean"]],
+        x=[col], marker_color='#636efa', showlegend=False,
+    ))
+    if len(stats["outliers"]):
+        fig.add_trace(go.Scatter(x=[col] * len(stats["outliers"]), y=stats["outliers"], mode='markers',
+                                 marker=dict(color='#636efa', size=5), name='Outliers', showlegend=False))
+    fig.update_layout(title=title, yaxis_title=col)
+    return fig
 
 def format_number(num):
     if num > 1000000:
@@ -8,79 +202,157 @@ def format_number(num):
         return f"{num/1000:.2f}K"
     return f"{num:.2f}"
 
-def generate_dashboard_charts(df, col_types, kpi_cols):
+def dashboard_dimensions(col_types, kpi_cols, nunique):
     """
-    Generates a list of charts for a 3-column grid.
-    All charts are returned with standard compact sizing.
+    Grouping columns used by the dashboard charts: the trend's date column, the pie's
+    low-cardinality category, the ranking bar's high-cardinality category and the secondary
+    count bar's category. Unused slots are None.
     """
-    charts = []
-    
     primary_metric = kpi_cols[0] if kpi_cols else None
-    
-    # helper to set common layout
-    def update_layout(fig):
-        fig.update_layout(
-            margin=dict(t=40, l=10, r=10, b=10),
-            height=250, # Compact height
-            paper_bgcolor='rgba(0,0,0,0)',
-            plot_bgcolor='rgba(0,0,0,0)',
-            title_font_size=14
-        )
-        fig.update_xaxes(rangeslider_visible=True)
-        return fig
+    date_col = col_types['date'][0] if primary_metric and col_types['date'] else None
 
-    # 1. TREND (Line)
-    if primary_metric and col_types['date']:
-        date_col = col_types['date'][0]
-        df_trend = df.groupby(date_col)[primary_metric].sum().reset_index()
-        fig = px.line(df_trend, x=date_col, y=primary_metric, title=f"Trend: {primary_metric}")
-        charts.append({"fig": update_layout(fig)})
-        
-    # 2. COMPOSITION (Pie)
     suitable_cat = None
     for col in col_types['categorical']:
-        if 2 <= df[col].nunique() <= 8:
+        if 2 <= nunique(col) <= 8:
             suitable_cat = col
             break
-    if suitable_cat and primary_metric:
-        df_cat = df.groupby(suitable_cat)[primary_metric].sum().reset_index()
-        fig = px.pie(df_cat, values=primary_metric, names=suitable_cat, title=f"By: {suitable_cat}", hole=0.5)
-        charts.append({"fig": update_layout(fig)})
-    
-    # 3. RANKING (Bar)
+
     high_card_cat = None
     for col in col_types['categorical']:
-        if df[col].nunique() > 8:
+        if nunique(col) > 8:
             high_card_cat = col
             break
     if not high_card_cat and not suitable_cat and col_types['categorical']:
         high_card_cat = col_types['categorical'][0]
-        
-    if high_card_cat and primary_metric:
-        top_n = df.groupby(high_card_cat)[primary_metric].sum().nlargest(8).reset_index()
-        fig = px.bar(top_n, x=primary_metric, y=high_card_cat, orientation='h', title=f"Top {high_card_cat}")
+
+    sec_cat = None
+    if len(col_types['categorical']) > 1:
+        sec_cat = col_types['categorical'][1]
+        if sec_cat == suitable_cat or sec_cat == high_card_cat:
+            sec_cat = None
+
+    return {"date": date_col, "pie": suitable_cat, "ranking": high_card_cat, "secondary": sec_cat}
+
+def dashboard_columns(col_types, kpi_cols, nunique):
+    """Every column the dashboard charts read, so a filtered view can take only these."""
+    dims = dashboard_dimensions(col_types, kpi_cols, nunique)
+    return list(dict.fromkeys(list(kpi_cols) + [d for d in dims.values() if d is not None]))
+
+def dashboard_chart_specs(col_types, kpi_cols, nunique):
+    """
+    The dashboard's charts in grid order, as {"kind", "dim"} specs. "dim" is the column
+    the chart groups by (None for the scatter and histogram); selections on the trend, pie
+    and bar charts cross-filter the other charts on that column.
+    """
+    dims = dashboard_dimensions(col_types, kpi_cols, nunique)
+    primary_metric = kpi_cols[0] if kpi_cols else None
+    specs = []
+    if dims["date"]:
+        specs.append({"kind": "trend", "dim": dims["date"]})
+    if dims["pie"] and primary_metric:
+        specs.append({"kind": "pie", "dim": dims["pie"]})
+    if dims["ranking"] and primary_metric:
+        specs.append({"kind": "ranking", "dim": dims["ranking"]})
+    if len(kpi_cols) >= 2:
+        specs.append({"kind": "scatter", "dim": None})
+    if primary_metric:
+        specs.append({"kind": "histogram", "dim": None})
+    if dims["secondary"]:
+        specs.append({"kind": "secondary", "dim": dims["secondary"]})
+    return specs
+
+def _compact_layout(fig):
+    """Common layout of the dashboard grid charts."""
+    fig.update_layout(
+        margin=dict(t=40, l=10, r=10, b=10),
+        height=250, # Compact height
+        paper_bgcolor='rgba(0,0,0,0)',
+        plot_bgcolor='rgba(0,0,0,0)',
+        title_font_size=14
+    )
+    fig.update_xaxes(rangeslider_visible=True)
+    return fig
+
+def build_dashboard_chart(spec, df, kpi_cols, plan):
+    """
+    Builds one dashboard chart from its spec. Grouped charts (trend, pie, bars) read their
+    sums and counts from `plan` (an AggregationPlan or CubeSelection); the scatter and the
+    histogram read the rows in `df`.
+    """
+    kind, dim = spec["kind"], spec["dim"]
+    primary_metric = kpi_cols[0] if kpi_cols else None
+    chart = {"kind": kind, "dim": dim}
+
+    # 1. TREND (Line)
+    if kind == "trend":
+        x, y = sorted_series(plan.sums(dim).reset_index(), dim, primary_metric)
+        fig = trend_figure(x, y, dim, primary_metric, GRID_CHART_WIDTH_PX, title=f"Trend: {primary_metric}")
+        # "trend" lets the enlarged view rebuild this chart at full resolution
+        chart["trend"] = (dim, primary_metric)
+
+    # 2. COMPOSITION (Pie)
+    elif kind == "pie":
+        df_cat = plan.sums(dim).reset_index()
+        df_cat[dim] = df_cat[dim].astype(str)
+        # A one-level sunburst renders like a pie, and unlike a pie its slices can be selected
+        fig = px.sunburst(df_cat, path=[dim], values=primary_metric, title=f"By: {dim}")
+
+    # 3. RANKING (Bar)
+    elif kind == "ranking":
+        top_n = plan.sums(dim).nlargest(8).reset_index()
+        fig = px.bar(top_n, x=primary_metric, y=dim, orientation='h', title=f"Top {dim}")
         fig.update_layout(yaxis=dict(autorange="reversed"))
-        charts.append({"fig": update_layout(fig)})
-        
+
     # 4. RELATIONSHIP (Scatter)
-    if len(kpi_cols) >= 2:
+    elif kind == "scatter":
         m1, m2 = kpi_cols[0], kpi_cols[1]
-        fig = px.scatter(df, x=m1, y=m2, title=f"{m1} vs {m2}")
-        charts.append({"fig": update_layout(fig)})
-        
+        fig = scatter_figure(df, m1, m2, title=f"{m1} vs {m2}")
+
     # 5. DISTRIBUTION (Histogram) - Primary
-    if primary_metric:
-        fig = px.histogram(df, x=primary_metric, title=f"Dist: {primary_metric}")
-        charts.append({"fig": update_layout(fig)})
-        
-    # 6. SECONDARY CATEGORY (Bar) if available
-    if len(col_types['categorical']) > 1:
-        sec_cat = col_types['categorical'][1]
-        if sec_cat != suitable_cat and sec_cat != high_card_cat:
-            top_n = df[sec_cat].value_counts().nlargest(8).reset_index()
-            top_n.columns = [sec_cat, 'Count']
-            fig = px.bar(top_n, x='Count', y=sec_cat, orientation='h', title=f"Count by {sec_cat}")
-            fig.update_layout(yaxis=dict(autorange="reversed"))
-            charts.append({"fig": update_layout(fig)})
-
-    return charts
+    elif kind == "histogram":
+        fig = histogram_figure(df[primary_metric].to_numpy(dtype='float64', na_value=np.nan), primary_metric, title=f"Dist: {primary_metric}")
+
+    # 6. SECONDARY CATEGORY (Bar)
+    else:
+        top_n = plan.counts(dim).nlargest(8).reset_index()
+        fig = px.bar(top_n, x='Count', y=dim, orientation='h', title=f"Count by {dim}")
+        fig.update_layout(yaxis=dict(autorange="reversed"))
+
+    chart["fig"] = _compact_layout(fig)
+    return chart
+
+def chart_plan(rows, specs, kpi_cols, aggregates=None):
+    """
+    Sums and counts for the grouped charts in `specs`, which share one set of filters:
+    `aggregates` (a CubeSelection) when it covers them, otherwise one AggregationPlan over
+    every dimension at once. `rows()` returns the filtered frame and is only called then.
+    """
+    primary_metric = kpi_cols[0] if kpi_cols else None
+    metric_dims = [s["dim"] for s in specs if s["kind"] in ("trend", "pie", "ranking")]
+    count_dims = [s["dim"] for s in specs if s["kind"] == "secondary"]
+    if aggregates is not None and aggregates.covers(metric_dims + count_dims, primary_metric):
+        return aggregates
+    return AggregationPlan(rows(), metric_dims + count_dims, primary_metric)
+
+def selection_filter(chart, selection):
+    """
+    Turns a chart's on_select state into a filter entry for the other charts:
+    (column, values) for pie slices and bars, ("date", start, end) for a trend range.
+    Returns None when nothing is selected.
+    """
+    points = (selection or {}).get("points") or []
+    if chart["kind"] == "trend":
+        boxes = (selection or {}).get("box") or []
+        xs = list(boxes[0]["x"]) if boxes else [p["x"] for p in points if "x" in p]
+        if not xs:
+            return None
+        xs = pd.to_datetime(pd.Series(xs), errors='coerce', format='mixed').dropna()
+        if xs.empty:
+            return None
+        return ("date", xs.min().date(), xs.max().date())
+    if chart["kind"] == "pie":
+        values = [p.get("label") for p in points]
+    else:
+        values = [p.get("y") for p in points]
+    values = sorted({str(v) for v in values if v is not None})
+    return (chart["dim"], tuple(values)) if values else None
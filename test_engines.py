@@ -0,0 +1,127 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.aggregation import AggregationPlan
+from src.filters import FilterIndex
+from src.cube import DataCube
+
+def make_frame(rows=3000, seed=0):
+    """Mixed frame with missing values in every column kind, a categorical and tz-aware dates."""
+    rng = np.random.default_rng(seed)
+    region = pd.Categorical(rng.choice(["Asia", "Europe", "Africa", None], rows),
+                            categories=["Africa", "Asia", "Europe", "Oceania"])  # Oceania never occurs
+    city = pd.Series(rng.choice(["Paris", "Rome", "Oslo", "Lima", None], rows), dtype=object)
+    sales = rng.normal(100, 30, rows)
+    sales[rng.random(rows) < 0.1] = np.nan
+    dates = pd.Series(pd.Timestamp("2024-01-01", tz="Europe/Paris")
+                      + pd.to_timedelta(rng.integers(0, 90 * 24, rows), unit="h"))
+    dates[rng.random(rows) < 0.05] = pd.NaT
+    return pd.DataFrame({"Region": region, "City": city, "Sales": sales, "Units": rng.integers(0, 50, rows),
+                         "Date": dates})
+
+@pytest.fixture(scope="module")
+def df():
+    return make_frame()
+
+def assert_same_groups(actual, expected):
+    """Same groups (compared as text) and values, ignoring index dtype and series names."""
+    actual = actual.sort_index(key=lambda idx: idx.astype(str))
+    expected = expected.sort_index(key=lambda idx: idx.astype(str))
+    assert list(actual.index.astype(str)) == list(expected.index.astype(str))
+    np.testing.assert_allclose(actual.to_numpy(dtype=float), expected.to_numpy(dtype=float))
+
+@pytest.mark.parametrize("dim", ["Region", "City"])
+def test_aggregation_plan_matches_groupby(df, dim):
+    plan = AggregationPlan(df, [dim, "Region"], "Sales")
+    assert_same_groups(plan.sums(dim), df.groupby(dim, observed=True)["Sales"].sum())
+    assert_same_groups(plan.counts(dim), df.groupby(dim, observed=True).size())
+    assert plan.sums(dim).name == "Sales"
+    assert plan.counts(dim).name == "Count"
+
+def test_aggregation_plan_integer_metric(df):
+    plan = AggregationPlan(df, ["City"], "Units")
+    assert_same_groups(plan.sums("City"), df.groupby("City")["Units"].sum())
+
+def expected_positions(df, date_range=None, values=None):
+    """Rows the sidebar filters select, computed the plain pandas way."""
+    keep = pd.Series(True, index=df.index)
+    if date_range is not None:
+        days = df["Date"].dt.date
+        keep &= (days >= date_range[0]) & (days <= date_range[1])
+    for col, allowed in (values or {}).items():
+        keep &= df[col].astype(str).isin(allowed)
+    return np.flatnonzero(keep.to_numpy())
+
+@pytest.fixture(scope="module")
+def filter_index(df):
+    return FilterIndex(df, "Date", ["Region"], code_cols=["City"])
+
+def test_filter_index_values_match_isin(df, filter_index):
+    for col, allowed in (("Region", ["Asia", "Europe"]), ("Region", ["Oceania"]), ("City", ["Rome", "Lima"])):
+        mask = filter_index.value_mask(col, allowed)
+        np.testing.assert_array_equal(filter_index.positions(mask), expected_positions(df, values={col: allowed}))
+
+def test_filter_index_dates_match_day_range(df, filter_index):
+    start, end = pd.Timestamp("2024-01-15").date(), pd.Timestamp("2024-02-10").date()
+    mask = filter_index.date_mask(start, end)
+    np.testing.assert_array_equal(filter_index.positions(mask), expected_positions(df, (start, end)))
+    # The full range still drops rows without a date...
+    first, last = filter_index.date_min.date(), filter_index.date_max.date()
+    mask = filter_index.date_mask(first, last)
+    np.testing.assert_array_equal(filter_index.positions(mask), expected_positions(df, (first, last)))
+    # ...and selects every row, reported as no mask at all, when none are missing
+    dated = df.dropna(subset=["Date"]).reset_index(drop=True)
+    assert FilterIndex(dated, "Date").date_mask(first, last) is None
+
+def test_filter_index_combined_select(df, filter_index):
+    start, end = pd.Timestamp("2024-02-01").date(), pd.Timestamp("2024-03-01").date()
+    filters = (("date", start, end), ("Region", ("Asia",)), ("City", ("Paris", "Oslo")))
+    mask = filter_index.select(filters)
+    expected = expected_positions(df, (start, end), {"Region": ["Asia"], "City": ["Paris", "Oslo"]})
+    np.testing.assert_array_equal(filter_index.positions(mask), expected)
+    assert filter_index.count(mask) == len(expected)
+    assert filter_index.select(()) is None
+
+def test_filter_index_options(df, filter_index):
+    assert filter_index.options("Region") == sorted(df["Region"].dropna().astype(str).unique())
+    mask = filter_index.value_mask("City", ["Rome"])
+    rome = df[df["City"] == "Rome"]
+    assert filter_index.options("Region", mask) == sorted(rome["Region"].dropna().astype(str).unique())
+
+CUBE_FILTERS = [
+    (),
+    (("Region", ("Asia", "Oceania")),),
+    (("date", pd.Timestamp("2024-01-20").date(), pd.Timestamp("2024-02-20").date()), ("City", ("Rome", "Lima"))),
+]
+
+@pytest.mark.parametrize("filters", CUBE_FILTERS)
+def test_data_cube_matches_filtered_rows(df, filters):
+    cube = DataCube(df, "Date", ["Region", "City"], ["Sales", "Units"])
+    selection = cube.select(filters, "Sales")
+    date_range = next(((f[1], f[2]) for f in filters if f[0] == "date"), None)
+    values = {f[0]: list(f[1]) for f in filters if f[0] != "date"}
+    rows = df.iloc[expected_positions(df, date_range, values)]
+
+    for measure in ("Sales", "Units"):
+        assert selection.total(measure) == pytest.approx(rows[measure].sum())
+    for dim in ("Region", "City"):
+        assert selection.covers([dim], "Sales")
+        assert_same_groups(selection.sums(dim), rows.groupby(dim, observed=True)["Sales"].sum())
+        assert_same_groups(selection.counts(dim), rows.groupby(dim, observed=True).size())
+    # Hourly dates are not answered from day-grain cells
+    assert not cube.daily and not selection.covers(["Date"], "Sales")
+
+def test_data_cube_daily_trend(df):
+    daily = df.assign(Date=df["Date"].dt.floor("D"))
+    cube = DataCube(daily, "Date", ["Region"], ["Sales"])
+    assert cube.daily
+    selection = cube.select((("Region", ("Europe",)),), "Sales")
+    assert selection.covers(["Date"], "Sales")
+    rows = daily[daily["Region"] == "Europe"]
+    expected = rows.groupby(rows["Date"].dt.tz_localize(None))["Sales"].sum()
+    assert_same_groups(selection.sums("Date"), expected)
+
+def test_data_cube_rejects_unknown_filter_column(df):
+    cube = DataCube(df, "Date", ["Region"], ["Sales"])
+    assert cube.select((("City", ("Rome",)),), "Sales") is None